@@ -0,0 +1,306 @@
+import argparse
+import io
+import json
+import math
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from translate_number_to_string import (digit_words, get_number_string,
+                                        get_number_strings, get_number_tokens,
+                                        get_number_tokens_batch, get_trio_string,
+                                        join_up, join_words, np,
+                                        parse_number_strings, simplify,
+                                        tokens_to_string, translate_stream,
+                                        trio_strings)
+
+# Above this many digits inputs are kept sparse (a dense tail and a leading
+# one): every non-zero group repeats its "tỉ" words, so a dense 10^6-digit
+# number would read as tens of gigabytes of text.
+DENSE_LIMIT = 10000
+
+results = []
+
+
+# A frozen copy of the original implementation, word lists included, so that
+# the golden checks do not depend on anything in translate_number_to_string.
+baseline_level_join_words = ["", "nghìn", "triệu", "tỉ"]
+baseline_join_words = ["", "mươi", "trăm"]
+baseline_digit_words = ["không", "một", "hai", "ba", "bốn", "năm", "sáu", "bảy", "tám", "chín"]
+
+
+def baseline_join_up(*words):
+    return ' '.join(filter(lambda w: w, words))
+
+
+def baseline_simplify(string):
+    result = string
+    result = result.replace('mươi không', 'mươi')
+    result = result.replace('không mươi', 'lẻ')
+    result = result.replace('không trăm lẻ', 'lẻ')
+    result = result.replace('trăm lẻ', 'trăm')
+    result = result.replace('một mươi', 'mười')
+    result = result.replace('mươi một', 'mươi mốt')
+    result = result.replace('mươi bốn', 'mươi tư')
+    result = result.replace('mươi năm', 'mươi lăm')
+    return result
+
+
+def baseline_trio_string(trio):
+    result = ''
+    length = len(trio)
+    for i in range(length):
+        digit = int(trio[length - 1 - i])
+        result = baseline_join_up(baseline_digit_words[digit], baseline_join_words[i], result)
+    return baseline_simplify(result)
+
+
+def reference_number_string(number_input):
+    # The original prepend-per-group implementation, kept as the baseline.
+    length = len(number_input)
+    level = math.ceil(length / 3)
+    result = ''
+    for lev in range(level):
+        start = length - 3 * (lev + 1)
+        if start < 0:
+            start = 0
+        end = length - 3 * lev
+        trio = number_input[start:end]
+        if int(trio) == 0:
+            continue
+        complex_level_join_word = ''
+        leap_level = lev
+        while leap_level > 3:
+            complex_level_join_word = baseline_join_up(baseline_level_join_words[3], complex_level_join_word)
+            leap_level -= 3
+        complex_level_join_word = baseline_join_up(baseline_level_join_words[leap_level], complex_level_join_word)
+        result = baseline_join_up(baseline_trio_string(trio), complex_level_join_word, result)
+    return result
+
+
+def random_number(length, rng):
+    return ''.join(rng.choice('0123456789') for _ in range(length))
+
+
+def make_number(length, rng):
+    if length <= DENSE_LIMIT:
+        return random_number(length, rng)
+    return '1' + '0' * (length - 1 - DENSE_LIMIT) + random_number(DENSE_LIMIT, rng)
+
+
+def record(name, digits, count, seconds, peak=None):
+    result = {
+        'name': name,
+        'digits': digits,
+        'count': count,
+        'seconds': seconds,
+        'per_second': count / seconds if seconds else None,
+        'peak_bytes': peak,
+    }
+    results.append(result)
+    print('{:<28} {:>8} {:>9} {:>12.6f} {:>14.0f}'.format(
+        name, digits, count, seconds, result['per_second'] or 0))
+
+
+def best_time(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def measure(function, number_input):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(number_input)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def raw_trio_string(trio):
+    # get_trio_string without the final simplify, to time simplify alone.
+    result = ''
+    length = len(trio)
+    for i in range(length):
+        result = join_up(digit_words[int(trio[length - 1 - i])], join_words[i], result)
+    return result
+
+
+def bench_trio(repeat):
+    trios = ['{:03d}'.format(value) for value in range(1000)]
+    raw_strings = [raw_trio_string(trio) for trio in trios]
+    record('get_trio_string', 3, len(trios),
+           best_time(lambda: [get_trio_string(trio) for trio in trios], repeat))
+    record('simplify', 3, len(raw_strings),
+           best_time(lambda: [simplify(raw) for raw in raw_strings], repeat))
+    record('trio_strings lookup', 3, len(trios),
+           best_time(lambda: [trio_strings[trio] for trio in trios], repeat))
+
+
+def bench_single(repeat, seed=0):
+    rng = random.Random(seed)
+    for length in (1, 3, 6, 9, 12, 18, 30):
+        number_inputs = [random_number(length, rng) for _ in range(10000)]
+        record('get_number_string', length, len(number_inputs),
+               best_time(lambda: [get_number_string(number_input) for number_input in number_inputs], repeat))
+
+
+def bench_long(lengths, seed=0):
+    rng = random.Random(seed)
+    for length in lengths:
+        number_input = make_number(length, rng)
+        result, elapsed, peak = measure(get_number_string, number_input)
+        record('get_number_string long', length, 1, elapsed, peak)
+        del result
+
+
+def bench_batch(repeat, count, seed=0):
+    rng = random.Random(seed)
+    number_inputs = [str(rng.randrange(10 ** 12)) for _ in range(count)]
+    record('get_number_strings strings', 12, count,
+           best_time(lambda: get_number_strings(number_inputs), repeat))
+    record('get_number_tokens_batch', 12, count,
+           best_time(lambda: get_number_tokens_batch(number_inputs), repeat))
+    if np is not None:
+        numbers = np.array([int(number_input) for number_input in number_inputs], dtype=np.int64)
+        record('get_number_strings numpy', 12, count,
+               best_time(lambda: get_number_strings(numbers), repeat))
+
+
+def bench_stream(repeat, count, processes, seed=0):
+    rng = random.Random(seed)
+    text = ''.join(str(rng.randrange(10 ** rng.randint(1, 15))) + '\n' for _ in range(count))
+
+    def run():
+        translate_stream(io.StringIO(text), io.StringIO(), io.StringIO(), processes=processes)
+
+    record('translate_stream x{}'.format(processes), 15, count, best_time(run, repeat))
+
+
+def bench_parse(repeat, count, seed=0):
+    rng = random.Random(seed)
+    readings = [get_number_string(str(rng.randrange(10 ** 12))) for _ in range(count)]
+    record('parse_number_strings', 12, count,
+           best_time(lambda: parse_number_strings(readings), repeat))
+
+
+def bench_scaling(lengths=(300, 1000, 3000, 10000), seed=0):
+    rng = random.Random(seed)
+    for length in lengths:
+        number_input = random_number(length, rng)
+        expected, reference_time, reference_peak = measure(reference_number_string, number_input)
+        result, current_time, current_peak = measure(get_number_string, number_input)
+        assert result == expected, 'Output differs at {} digits.'.format(length)
+        record('reference scaling', length, 1, reference_time, reference_peak)
+        record('get_number_string scaling', length, 1, current_time, current_peak)
+
+
+def check_golden(count=20000, max_length=120, seed=0):
+    # Every trio and a sample of large numbers against the original code.
+    for trio, reading in trio_strings.items():
+        expected = baseline_trio_string(trio) if int(trio) else ''
+        assert reading == expected, 'Trio table differs for {}.'.format(trio)
+        assert get_trio_string(trio) == baseline_trio_string(trio), \
+            'get_trio_string differs for {}.'.format(trio)
+    rng = random.Random(seed)
+    number_inputs = [str(value) for value in range(100000)]
+    for _ in range(count):
+        number_input = random_number(rng.randint(1, max_length), rng)
+        if rng.random() < 0.5:
+            number_input = ''.join(digit if rng.random() < 0.2 else '0' for digit in number_input)
+        number_inputs.append(number_input)
+    for number_input in number_inputs:
+        expected = reference_number_string(number_input)
+        assert get_number_string(number_input) == expected, 'Output differs for {}.'.format(number_input)
+        assert tokens_to_string(get_number_tokens(number_input)) == expected, \
+            'Tokens differ for {}.'.format(number_input)
+    numbers = [int(number_input) for number_input in number_inputs if len(number_input) <= 18]
+    if np is not None:
+        readings = get_number_strings(np.array(numbers, dtype=np.int64))
+        assert readings == [get_number_string(str(number)) for number in numbers], \
+            'NumPy batch output differs.'
+    print('golden: {} trios and {} numbers match'.format(len(trio_strings), len(number_inputs)))
+
+
+def check_round_trip(count=100000, max_length=60, seed=0):
+    # Every reading must parse back to its digits without leading zeros.
+    rng = random.Random(seed)
+    number_inputs = [str(value) for value in range(10000)]
+    while len(number_inputs) < count:
+        length = rng.randint(1, max_length)
+        number_input = random_number(length, rng)
+        if rng.random() < 0.5:
+            number_input = ''.join(digit if rng.random() < 0.2 else '0' for digit in number_input)
+        number_inputs.append(number_input)
+    readings = [get_number_string(number_input) for number_input in number_inputs]
+    parsed = parse_number_strings(readings)
+    for number_input, digits in zip(number_inputs, parsed):
+        assert digits == (number_input.lstrip('0') or '0'), 'Round trip failed for {}.'.format(number_input)
+    print('round trip: {} readings match'.format(len(readings)))
+
+
+def compare(baseline_path):
+    with open(baseline_path, encoding='utf-8') as baseline_file:
+        baseline = json.load(baseline_file)
+    previous = {(result['name'], result['digits']): result for result in baseline['results']}
+    print('{:<28} {:>8} {:>12} {:>12} {:>8}'.format('name', 'digits', 'baseline s', 'current s', 'ratio'))
+    for result in results:
+        before = previous.get((result['name'], result['digits']))
+        if before and before['seconds']:
+            print('{:<28} {:>8} {:>12.6f} {:>12.6f} {:>8.2f}'.format(
+                result['name'], result['digits'], before['seconds'], result['seconds'],
+                result['seconds'] / before['seconds']))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark and regression suite for translate_number_to_string.')
+    parser.add_argument('--quick', action='store_true', help='smaller inputs and fewer repeats')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--compare', help='compare against results written earlier with --json')
+    parser.add_argument('--processes', type=int, default=2, help='pool size for the streaming benchmark')
+    parser.add_argument('--skip-checks', action='store_true', help='only measure throughput')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    repeat = 1 if args.quick else 3
+    count = 20000 if args.quick else 200000
+    long_lengths = (10 ** 3, 10 ** 4, 10 ** 5) if args.quick else (10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6)
+    scaling_lengths = (300, 1000, 3000) if args.quick else (300, 1000, 3000, 10000)
+
+    if not args.skip_checks:
+        check_golden(count=2000 if args.quick else 20000)
+        check_round_trip(count=20000 if args.quick else 100000)
+    print('{:<28} {:>8} {:>9} {:>12} {:>14}'.format('name', 'digits', 'count', 'seconds', 'per second'))
+    bench_trio(repeat)
+    bench_single(repeat)
+    bench_long(long_lengths)
+    bench_scaling(scaling_lengths)
+    bench_batch(repeat, count)
+    bench_stream(repeat, count, 1)
+    if args.processes > 1:
+        bench_stream(repeat, count, args.processes)
+    bench_parse(repeat, count)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as json_file:
+            json.dump({
+                'python': sys.version,
+                'platform': platform.platform(),
+                'numpy': np.__version__ if np is not None else None,
+                'results': results,
+            }, json_file, ensure_ascii=False, indent=2)
+    if args.compare:
+        compare(args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from video_engine import META, Job, JobJournal, JobQueue, Model, getFfmpegVersion
+
+results = []
+
+
+def makeClip(directory, name, duration, size, rate=25, pad=None) -> str:
+    # testsrc and sine with fixed settings, so every run encodes the same
+    # frames.
+    path = os.path.join(directory, name)
+    videoFilter = ['-vf', 'pad={}'.format(pad)] if pad else []
+    subprocess.run(['ffmpeg', '-v', 'error', '-y',
+                    '-f', 'lavfi', '-i', 'testsrc=size={}:rate={}:duration={}'.format(size, rate, duration),
+                    '-f', 'lavfi', '-i', 'sine=frequency=440:sample_rate=48000:duration={}'.format(duration)]
+                   + videoFilter
+                   + ['-c:v', 'libx264', '-preset', 'veryfast', '-g', str(rate * 2), '-pix_fmt', 'yuv420p',
+                      '-c:a', 'aac', '-shortest', '-fflags', '+bitexact', path],
+                   stdin=subprocess.DEVNULL, check=True)
+    return path
+
+
+def makeClips(directory, duration, width, height) -> dict:
+    barHeight = height // 8
+    return {
+        'plain': makeClip(directory, 'plain.mp4', duration, '{}x{}'.format(width, height)),
+        'second': makeClip(directory, 'second.mp4', duration, '{}x{}'.format(width, height)),
+        'letterbox': makeClip(directory, 'letterbox.mp4', duration, '{}x{}'.format(width, height - 2 * barHeight),
+                              pad='{}:{}:0:{}'.format(width, height, barHeight)),
+    }
+
+
+def getScenarios(clips, duration, width, height) -> list:
+    # (name, input paths, Model events) covering every META feature.
+    def select(feature):
+        return {'featureSelectorCbb': list(META.keys()).index(feature)}
+
+    barHeight = height // 8
+    return [
+        ('FORMAT', [clips['plain']], []),
+        ('FORMAT remux', [clips['plain']], [{'remuxChk': True}]),
+        ('CUT', [clips['plain']], [select('CUT'), {'fromTimeTbx': str(duration / 4),
+                                                   'toTimeTbx': str(duration * 3 / 4)}]),
+        ('CONCAT', [clips['plain'], clips['second']], [select('CONCAT')]),
+        ('RMBLBAR', [clips['letterbox']], [select('RMBLBAR'), {'blankRectangle': '{}:{}:0:{}'.format(
+            width, height - 2 * barHeight, barHeight)}]),
+        ('ROTATE', [clips['plain']], [select('ROTATE'), {'rotateModeGroup': 1}]),
+        ('CROP', [clips['plain']], [select('CROP'), {'cropTbx': '{}:{}:{}:{}'.format(
+            width // 2, height // 2, width // 4, height // 4)}]),
+    ]
+
+
+def runScenario(paths, events) -> dict:
+    model = Model()
+    model.createCommand({'dragDropFile': paths, 'overwriteChk': True, 'copyAudioChk': True})
+    for event in events:
+        model.createCommand(event)
+    jobs = model.createJobs()
+    jobQueue = JobQueue(1)
+    jobQueue.submitJobs(jobs)
+    jobQueue.wait()
+    failedJobs = [job for job in jobs if job.status != Job.DONE]
+    if failedJobs:
+        raise RuntimeError('{} failed:\n{}'.format(failedJobs[0].command, failedJobs[0].log))
+    metrics = {'wallTime': 0, 'cpuTime': 0, 'peakRss': 0}
+    for job in jobs:
+        metrics['wallTime'] += job.metrics.get('wallTime', 0)
+        metrics['cpuTime'] += job.metrics.get('cpuTime', 0)
+        metrics['peakRss'] = max(metrics['peakRss'], job.metrics.get('peakRss', 0))
+    metrics['speed'] = jobs[-1].metrics.get('speed')
+    metrics['outputBytes'] = os.path.getsize(jobs[-1].outputPath)
+    metrics['command'] = jobs[-1].command
+    return metrics
+
+
+def checkResume(clips, duration, directory) -> None:
+    # Jobs left running by a process that died are resumed from a journal
+    # while the partial piece the interrupted ffmpeg wrote is still there.
+    journal = JobJournal(os.path.join(directory, 'jobs.sqlite'))
+    # No owner, as if the rows came from a process that is gone.
+    journal.owner = None
+    cases = [
+        ('smart cut', '0.ts', [{'featureSelectorCbb': list(META.keys()).index('CUT')},
+                               {'fromTimeTbx': str(duration / 10), 'toTimeTbx': str(duration * 9 / 10),
+                                'smartCutChk': True}]),
+        ('segments', '0.mkv', [{'segmentsSpb': 2}]),
+    ]
+    for name, pieceName, events in cases:
+        model = Model()
+        model.createCommand({'dragDropFile': [clips['plain']], 'overwriteChk': True, 'copyAudioChk': True})
+        for event in events:
+            model.createCommand(event)
+        jobs = model.createJobs()
+        if not jobs[-1].tempPaths:
+            raise RuntimeError('resume {}: no pieces to leave behind'.format(name))
+        for job in jobs:
+            job.status = Job.RUNNING
+            journal.record(job)
+        with open(os.path.join(jobs[-1].tempPaths[0], pieceName), 'wb') as pieceFile:
+            pieceFile.write(b'partial')
+        resumedJobs = JobJournal(journal.databasePath).loadUnfinished()
+        jobQueue = JobQueue(1)
+        jobQueue.submitJobs(resumedJobs)
+        jobQueue.wait()
+        failedJobs = [job for job in resumedJobs if job.status != Job.DONE]
+        if len(resumedJobs) != len(jobs) or failedJobs:
+            raise RuntimeError('resume {} failed:\n{}'.format(
+                name, failedJobs[0].log if failedJobs else 'not every job was resumed'))
+        print('resume {:<9} ok'.format(name))
+
+
+def record(name, metrics) -> None:
+    result = dict(metrics, name=name)
+    results.append(result)
+    print('{:<16} {:>10.3f} {:>10.3f} {:>8} {:>10.1f} {:>12}'.format(
+        name, result['wallTime'], result['cpuTime'], '{:.2f}x'.format(result['speed'] or 0),
+        result['peakRss'] / (1 << 20), result['outputBytes']))
+
+
+def compare(baselinePath, tolerance: float) -> list:
+    with open(baselinePath, encoding='utf-8') as baselineFile:
+        baseline = json.load(baselineFile)
+    previous = {result['name']: result for result in baseline['results']}
+    if baseline.get('ffmpeg') != getFfmpegVersion():
+        print('note: baseline was taken with {}'.format(baseline.get('ffmpeg')))
+    regressions = []
+    print('{:<16} {:>12} {:>12} {:>8}'.format('name', 'baseline s', 'current s', 'ratio'))
+    for result in results:
+        before = previous.get(result['name'])
+        if not before or not before['wallTime']:
+            continue
+        ratio = result['wallTime'] / before['wallTime']
+        print('{:<16} {:>12.3f} {:>12.3f} {:>8.2f}{}'.format(
+            result['name'], before['wallTime'], result['wallTime'], ratio,
+            '  slower' if ratio > tolerance else ''))
+        if ratio > tolerance:
+            regressions.append(result['name'])
+    return regressions
+
+
+def parseArgs(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark every video_editor feature on generated clips.')
+    parser.add_argument('--quick', action='store_true', help='shorter, smaller clips and one run each')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--compare', help='compare against results written earlier with --json')
+    parser.add_argument('--tolerance', type=float, default=1.25,
+                        help='wall time ratio above which --compare reports a regression')
+    parser.add_argument('--workdir', help='directory for the clips and outputs, kept afterwards')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parseArgs(argv)
+    repeat = 1 if args.quick else 3
+    duration = 5 if args.quick else 20
+    width, height = (640, 360) if args.quick else (1280, 720)
+    directory = args.workdir or tempfile.mkdtemp(prefix='video_bench_')
+    os.makedirs(directory, exist_ok=True)
+
+    try:
+        clips = makeClips(directory, duration, width, height)
+        scenarios = getScenarios(clips, duration, width, height)
+        assert set(META) <= {name.split()[0] for name, _, _ in scenarios}, 'A META feature has no scenario.'
+        print('{:<16} {:>10} {:>10} {:>8} {:>10} {:>12}'.format(
+            'name', 'wall s', 'cpu s', 'speed', 'rss MiB', 'bytes'))
+        for name, paths, events in scenarios:
+            runs = [runScenario(paths, events) for _ in range(repeat)]
+            record(name, min(runs, key=lambda metrics: metrics['wallTime']))
+        checkResume(clips, duration, directory)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as jsonFile:
+            json.dump({
+                'python': sys.version,
+                'platform': platform.platform(),
+                'ffmpeg': getFfmpegVersion(),
+                'quick': args.quick,
+                'results': results,
+            }, jsonFile, ensure_ascii=False, indent=2)
+    if args.compare and compare(args.compare, args.tolerance):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
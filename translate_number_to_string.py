@@ -1,4 +1,18 @@
+import argparse
+import collections
+import functools
 import math
+import multiprocessing
+import os
+import socketserver
+import stat
+import sys
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 level_join_words = ["", "nghìn", "triệu", "tỉ"]
@@ -50,29 +64,446 @@ def get_trio_string(trio):
         result = join_up(digit_words[digit], join_words[i], result)
     return simplify(result)
 
+
+def build_trio_strings():
+    # Readings of every group of one, two or three digits, keyed by the group
+    # itself so that leading groups ("5", "05") keep their own readings.
+    # Groups of zeros are never read and map to ''.
+    table = {}
+    for length in range(1, 4):
+        for value in range(10 ** length):
+            trio = str(value).zfill(length)
+            table[trio] = get_trio_string(trio) if value else ''
+    return table
+
+
+trio_strings = build_trio_strings()
+
+
+def get_trio_reading(trio):
+    reading = trio_strings.get(trio)
+    if reading is None:
+        reading = get_trio_string(trio) if int(trio) else ''
+    return reading
+
     
-def get_number_string(number_input):
+def iter_number_groups(number_input):
+    # Groups of three digits from the most significant one down, with their
+    # level (0 for units, 1 for "nghìn", ...).
     length = len(number_input)
     level = math.ceil(length / 3)
-    result = ''
-    for lev in range(level):
-        start = length - 3 * (lev + 1)
-        if start < 0:
-            start = 0
-        end = length - 3 * lev
-        trio = number_input[start:end]
-        if int(trio) == 0:
-            continue
-        complex_level_join_word = ''
-        leap_level = lev
-        while leap_level > 3:
-            complex_level_join_word = join_up(level_join_words[3], complex_level_join_word)
-            leap_level -= 3
-        complex_level_join_word = join_up(level_join_words[leap_level], complex_level_join_word)
-        result = join_up(get_trio_string(trio), complex_level_join_word, result)
-    return result
+    start = 0
+    end = length - 3 * (level - 1)
+    for lev in range(level - 1, -1, -1):
+        yield number_input[start:end], lev
+        start = end
+        end += 3
+
+
+def iter_number_string(number_input):
+    # Single pass yielding the reading of every non-zero group with its level
+    # words. The "tỉ tỉ ..." tail is built once for the highest level and
+    # sliced for the lower ones.
+    level = math.ceil(len(number_input) / 3)
+    leap_word = level_join_words[3]
+    leap_step = len(leap_word) + 1
+    leap_chain = ' '.join([leap_word] * ((level - 2) // 3))
+    for trio, lev in iter_number_groups(number_input):
+        reading = get_trio_reading(trio)
+        if reading and lev:
+            leap_count = (lev - 1) // 3
+            leap_words = leap_chain[:leap_step * leap_count - 1] if leap_count else ''
+            yield join_up(reading, level_join_words[(lev - 1) % 3 + 1], leap_words)
+        elif reading:
+            yield reading
+
+
+def get_number_string(number_input):
+    return ' '.join(iter_number_string(number_input))
+
+
+def build_token_words():
+    return (digit_words + join_words[1:] + level_join_words[1:]
+            + [ten_join_word, change_join_word, spec_one, spec_four, spec_five])
+
+
+token_words = build_token_words()
+token_ids = {word: token_id for token_id, word in enumerate(token_words)}
+trio_tokens = {trio: bytes(token_ids[word] for word in reading.split())
+               for trio, reading in trio_strings.items()}
+level_tokens = [b''] + [bytes([token_ids[word]]) for word in level_join_words[1:]]
+
+
+def get_number_tokens(number_input, tokens=None):
+    # Same words as get_number_string, as token ids into token_words appended
+    # to an array('B'); np.frombuffer(tokens, np.uint8) views it without a copy.
+    if tokens is None:
+        tokens = array('B')
+    level = math.ceil(len(number_input) / 3)
+    leap_chain = level_tokens[3] * ((level - 2) // 3)
+    for trio, lev in iter_number_groups(number_input):
+        trio_token = trio_tokens.get(trio)
+        if trio_token is None:
+            trio_token = bytes(token_ids[word] for word in get_trio_reading(trio).split())
+        if trio_token:
+            tokens.frombytes(trio_token)
+            if lev:
+                tokens.frombytes(level_tokens[(lev - 1) % 3 + 1])
+                tokens.frombytes(leap_chain[:(lev - 1) // 3])
+    return tokens
+
+
+def get_number_tokens_batch(number_inputs):
+    # All readings in one token array; the reading of input i is
+    # tokens[offsets[i]:offsets[i + 1]].
+    tokens = array('B')
+    offsets = array('Q', [0])
+    for number_input in number_inputs:
+        get_number_tokens(str(number_input), tokens)
+        offsets.append(len(tokens))
+    return tokens, offsets
+
+
+def tokens_to_string(tokens):
+    return ' '.join([token_words[token_id] for token_id in tokens])
+
+
+def get_level_join_word(level):
+    if level == 0:
+        return ''
+    leap_words = [level_join_words[3]] * ((level - 1) // 3)
+    return join_up(level_join_words[(level - 1) % 3 + 1], *leap_words)
+
+
+array_group_pieces = {}
+
+
+def get_array_group_pieces(level):
+    # Object arrays indexed by group value holding the group reading with its
+    # level words: one for leading groups (no leading zeros, no separator)
+    # and one for the groups that follow them.
+    pieces = array_group_pieces.get(level)
+    if pieces is None:
+        level_join_word = get_level_join_word(level)
+        leading = np.empty(1000, dtype=object)
+        inner = np.empty(1000, dtype=object)
+        for value in range(1000):
+            leading_reading = trio_strings[str(value)]
+            inner_reading = trio_strings[str(value).zfill(3)]
+            leading[value] = join_up(leading_reading, level_join_word) if value else ''
+            inner[value] = ' ' + join_up(inner_reading, level_join_word) if value else ''
+        pieces = array_group_pieces[level] = (leading, inner)
+    return pieces
+
+
+def get_array_number_strings(numbers):
+    values = np.asarray(numbers).ravel()
+    if values.dtype.kind not in 'iu':
+        raise TypeError('Cần một mảng số nguyên.')
+    if values.dtype.kind == 'i' and (values < 0).any():
+        raise ValueError('Không đọc được số âm.')
+    remaining = values.astype(np.uint64)
+    groups = []
+    while remaining.any():
+        remaining, group = np.divmod(remaining, np.uint64(1000))
+        groups.append((group.astype(np.intp), remaining == 0))
+    readings = np.full(len(values), '', dtype=object)
+    for level in range(len(groups) - 1, -1, -1):
+        group, is_leading = groups[level]
+        leading, inner = get_array_group_pieces(level)
+        readings += np.where(is_leading, leading[group], inner[group])
+    return readings.tolist()
+
+
+def get_number_strings(numbers):
+    # Integer NumPy arrays are split into groups with vectorized divmod;
+    # anything else is treated as an iterable of digit strings.
+    if np is not None and isinstance(numbers, np.ndarray):
+        return get_array_number_strings(numbers)
+    return [get_number_string(number_input) for number_input in numbers]
+
+
+def build_reading_words():
+    words = {}
+    for digit, word in enumerate(digit_words):
+        words[word] = ('digit', digit)
+    words[join_words[1]] = ('tens', 0)
+    words[join_words[2]] = ('hundreds', 0)
+    words[ten_join_word] = ('ten', 1)
+    words[change_join_word] = ('change', 0)
+    words[spec_one] = ('unit', 1)
+    words[spec_four] = ('unit', 4)
+    words[spec_five] = ('unit', 5)
+    for level, word in enumerate(level_join_words[1:], 1):
+        words[word] = ('level', level)
+    return words
+
+
+reading_words = build_reading_words()
+
+
+def parse_number_string(number_string):
+    # Left-to-right finite-state reader over the words emitted by
+    # get_number_string. Each group is read as hundreds/tens/units followed
+    # by its level words ("nghìn", "triệu", "tỉ" and any repeated "tỉ").
+    tokens = number_string.split()
+    groups = []
+    state = 'group'
+    pending = hundreds = tens = units = level = 0
+    position = 0
+    while position <= len(tokens):
+        if position < len(tokens):
+            token = tokens[position]
+            if token not in reading_words:
+                raise ValueError('Không đọc được "{}" ở vị trí {}.'.format(token, position))
+            kind, value = reading_words[token]
+        else:
+            token, kind, value = '', 'end', 0
+
+        if state == 'group':
+            hundreds = tens = units = level = 0
+            if kind == 'digit':
+                pending, state = value, 'digit'
+            elif kind == 'ten':
+                tens, state = 1, 'ten'
+            elif kind == 'change':
+                state = 'change'
+            elif kind == 'end' and not groups:
+                break
+            else:
+                raise ValueError('Không đọc được "{}" ở vị trí {}.'.format(token, position))
+        elif state in ('digit', 'hundreds_digit'):
+            if kind == 'hundreds' and state == 'digit':
+                hundreds, state = pending, 'hundreds'
+            elif kind == 'tens' and pending > 1:
+                tens, state = pending, 'tens'
+            else:
+                units, state = pending, 'level'
+                continue
+        elif state == 'hundreds':
+            if kind == 'digit':
+                pending, state = value, 'hundreds_digit'
+            elif kind == 'ten':
+                tens, state = 1, 'ten'
+            elif kind == 'change':
+                state = 'change'
+            else:
+                state = 'level'
+                continue
+        elif state in ('tens', 'ten'):
+            if kind in ('digit', 'unit') and value:
+                units, state = value, 'level'
+            else:
+                state = 'level'
+                continue
+        elif state == 'change':
+            if kind != 'digit' or not value:
+                raise ValueError('Không đọc được "{}" ở vị trí {}.'.format(token, position))
+            units, state = value, 'level'
+        elif state in ('level', 'leap'):
+            if kind == 'level' and (state == 'level' or value == 3):
+                level += value if state == 'level' else 3
+                state = 'leap'
+            else:
+                if groups and level >= groups[-1][0]:
+                    raise ValueError('Sai thứ tự hàng ở vị trí {}.'.format(position))
+                groups.append((level, hundreds * 100 + tens * 10 + units))
+                if kind == 'end':
+                    break
+                state = 'group'
+                continue
+        position += 1
+
+    if not groups:
+        return '0'
+    if groups != [(0, 0)] and any(value == 0 for level, value in groups):
+        raise ValueError('Nhóm số không hợp lệ.')
+    group_values = dict(groups)
+    top_level = groups[0][0]
+    digits = [str(groups[0][1])]
+    for level in range(top_level - 1, -1, -1):
+        digits.append('{:03d}'.format(group_values.get(level, 0)))
+    return ''.join(digits)
+
+
+def parse_number_strings(number_strings):
+    return [parse_number_string(number_string) for number_string in number_strings]
+
+
+def iter_chunks(lines, chunk_size):
+    chunk = []
+    for line_number, line in enumerate(lines, 1):
+        chunk.append((line_number, line))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def translate_chunk(chunk, delimiter=None):
+    # Every input line gives one output line, its fields joined back with the
+    # delimiter. Invalid fields are left empty so that the output stays
+    # aligned with the input, and are reported back instead of raising.
+    readings = []
+    errors = []
+    for line_number, line in chunk:
+        fields = line.split(delimiter) if delimiter else [line]
+        line_readings = []
+        for field in fields:
+            number_input = field.strip()
+            if number_input.isdecimal():
+                line_readings.append(get_number_string(number_input))
+            else:
+                line_readings.append('')
+                errors.append('Dòng {}: "{}" không phải là số.'.format(line_number, number_input))
+        readings.append((delimiter or '').join(line_readings))
+    readings.append('')
+    return '\n'.join(readings), errors
+
+
+def translate_stream(input_stream, output_stream, error_stream, delimiter=None,
+                     processes=1, chunk_size=10000):
+    # Chunks are written in input order; with a pool at most two chunks per
+    # process are in flight, which keeps memory bounded for any input size.
+    error_count = 0
+
+    def write(result):
+        nonlocal error_count
+        text, errors = result
+        output_stream.write(text)
+        for error in errors:
+            error_stream.write(error + '\n')
+        error_count += len(errors)
+
+    chunks = iter_chunks(input_stream, chunk_size)
+    if processes > 1:
+        with multiprocessing.Pool(processes) as pool:
+            pending = collections.deque()
+            for chunk in chunks:
+                pending.append(pool.apply_async(translate_chunk, (chunk, delimiter)))
+                if len(pending) >= 2 * processes:
+                    write(pending.popleft().get())
+            while pending:
+                write(pending.popleft().get())
+    else:
+        for chunk in chunks:
+            write(translate_chunk(chunk, delimiter))
+    return error_count
+
+
+class TranslatorHandler(socketserver.BaseRequestHandler):
+    # Newline-delimited requests; every chunk received is answered with one
+    # send, so pipelined clients get their replies in order and in bulk.
+    # "stats" returns the cache counters instead of a reading.
+    def handle(self):
+        pending = b''
+        while True:
+            data = self.request.recv(1 << 16)
+            if data:
+                lines = (pending + data).split(b'\n')
+                pending = lines.pop()
+            else:
+                lines = [pending] if pending.strip() else []
+            if lines:
+                replies = [self.server.reply(line.decode('utf-8', 'replace').strip()) for line in lines]
+                self.request.sendall(('\n'.join(replies) + '\n').encode('utf-8'))
+            if not data:
+                break
+
+
+# Unix sockets are not available on every platform (e.g. Windows builds
+# without AF_UNIX); the server is only defined where they are.
+if hasattr(socketserver, 'UnixStreamServer'):
+    class TranslatorServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+        def __init__(self, socket_path, cache_size=1 << 16):
+            super().__init__(socket_path, TranslatorHandler)
+            self.read = functools.lru_cache(maxsize=cache_size)(get_number_string)
+
+        def reply(self, request):
+            if request == 'stats':
+                return self.get_stats()
+            if not request.isdecimal():
+                return 'error: "{}" không phải là số.'.format(request)
+            return self.read(request)
+
+        def get_stats(self):
+            info = self.read.cache_info()
+            lookups = info.hits + info.misses
+            return 'hits={} misses={} size={} maxsize={} hit_rate={:.4f}'.format(
+                info.hits, info.misses, info.currsize, info.maxsize,
+                info.hits / lookups if lookups else 0)
+
+
+def serve(socket_path, cache_size=1 << 16):
+    if not hasattr(socketserver, 'UnixStreamServer'):
+        raise OSError('Unix sockets are not supported on this platform.')
+    if os.path.exists(socket_path):
+        # Only a stale socket left by an earlier server is replaced.
+        if not stat.S_ISSOCK(os.stat(socket_path).st_mode):
+            raise FileExistsError('"{}" đã tồn tại và không phải là socket.'.format(socket_path))
+        os.unlink(socket_path)
+    with TranslatorServer(socket_path, cache_size) as server:
+        try:
+            server.serve_forever()
+        finally:
+            os.unlink(socket_path)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Đọc số thành chữ tiếng Việt.')
+    parser.add_argument('input', nargs='?',
+                        help='file of numbers, one per line ("-" for stdin); '
+                             'prompts for a single number when omitted')
+    parser.add_argument('-o', '--output', help='output file (default: stdout)')
+    parser.add_argument('--csv', action='store_true',
+                        help='read comma-separated numbers; each line gives one line '
+                             'of comma-separated readings')
+    parser.add_argument('-j', '--processes', type=int, default=1,
+                        help='number of worker processes')
+    parser.add_argument('--chunk-size', type=int, default=10000,
+                        help='lines per chunk')
+    parser.add_argument('--serve', metavar='SOCKET',
+                        help='answer newline-delimited requests on this Unix socket')
+    parser.add_argument('--cache-size', type=int, default=1 << 16,
+                        help='readings kept in the server cache')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.serve:
+        try:
+            serve(args.serve, args.cache_size)
+        except FileExistsError as error:
+            print(error, file=sys.stderr)
+            return 1
+        return 0
+    if args.input is None:
+        number_input = get_input()
+        print(get_number_string(number_input))
+        return 0
+
+    input_stream = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    if args.output:
+        output_stream = open(args.output, 'w', encoding='utf-8', buffering=1 << 20)
+    else:
+        sys.stdout.reconfigure(encoding='utf-8')
+        output_stream = sys.stdout
+    try:
+        error_count = translate_stream(input_stream, output_stream, sys.stderr,
+                                       delimiter=',' if args.csv else None,
+                                       processes=args.processes,
+                                       chunk_size=args.chunk_size)
+    finally:
+        if input_stream is not sys.stdin:
+            input_stream.close()
+        if output_stream is not sys.stdout:
+            output_stream.close()
+    return 1 if error_count else 0
 
 
 if __name__ == "__main__":
-    number_input = get_input()
-    print(get_number_string(number_input))
+    sys.exit(main())
@@ -1,54 +1,18 @@
+import subprocess
 import sys
-from pathlib import Path
-import winsound
+import threading
 
 from PyQt5 import QtCore, QtGui
-from PyQt5.QtCore import QProcess, QTime
-from PyQt5.QtWidgets import (QApplication, QButtonGroup, QCheckBox, QComboBox,
-                             QDesktopWidget, QDialog, QDialogButtonBox, QFormLayout, QGridLayout,
+from PyQt5.QtCore import QObject, QTime, pyqtSignal
+from PyQt5.QtWidgets import (QAbstractItemView, QApplication, QButtonGroup, QCheckBox,
+                             QComboBox, QDesktopWidget, QDialog, QFileDialog, QFormLayout, QGridLayout,
                              QGroupBox, QHBoxLayout, QLabel, QLineEdit,
-                             QMainWindow, QPushButton, QRadioButton, QTimeEdit,
+                             QMainWindow, QMessageBox, QPushButton, QRadioButton, QSpinBox,
+                             QTableWidget, QTableWidgetItem, QTimeEdit,
                              QVBoxLayout, QWidget)
 
-META = {
-    "FORMAT": {
-        "label": "Format",
-    },
-    "CUT": {
-        "label": "Cut",
-    },
-    "CONCAT": {
-        "label": "Concatenate",
-    },
-    "RMBLBAR": {
-        "label": "Remove blank bar",
-    },
-    "ROTATE": {
-        "label": "Rotate",
-    },
-    "CROP": {
-        "label": "Crop",
-    },
-}
-
-ROTATE_MODE = (
-    {
-        "value": 1,
-        "label": "Rotate 90deg",
-    },
-    {
-        "value": 2,
-        "label": "Rotate -90deg",
-    },
-    {
-        "value": 3,
-        "label": "Rotate 90deg and flip vertically",
-    },
-    {
-        "value": 4,
-        "label": "Rotate -90deg and flip vertically",
-    },
-)
+from video_engine import (META, ROTATE_MODE, Job, JobJournal, JobQueue, Model, OutputCache,
+                          formatTime, getCachePath, getMetadataCache, savePreset)
 
 
 class Component(QWidget):
@@ -117,87 +81,41 @@ class View(QMainWindow):
     def getCommand(self) -> str:
         return self.commandCpn.commandTxb.text()
 
-    def setBlankRectangle(self, value) -> None:
+    def setBlankRectangle(self, value, confidence: float = None) -> None:
         self.featureOptionCpn.rmBlBarFeatureOptionCpn.cropBlankTbx.setText(
             value)
+        self.featureOptionCpn.rmBlBarFeatureOptionCpn.cropBlankTbx.setToolTip(
+            '' if confidence is None else 'Confidence: {:.0%}'.format(confidence))
 
     def showFeatureOptions(self, feature) -> None:
         self.featureOptionCpn.showFeatureOptions(feature)
 
+    def setFeature(self, feature) -> None:
+        self.featureSelectorCpn.featureSelectorCbb.setCurrentIndex(
+            list(META.keys()).index(feature))
+        self.showFeatureOptions(feature)
 
-class Model():
-    def __init__(self) -> None:
-        self.metaKeys = list(META.keys())
-        self.paths = []
-        self.feature = self.metaKeys[0]
-        self.generalParams = {}
-        self.featureParams = {}
-
-    def setValueToState(self, events: dict) -> None:
-        for objectName, value in events.items():
-            if objectName == 'dragDropFile':
-                self.paths = value
-            elif objectName == 'featureSelectorCbb':
-                self.feature = self.metaKeys[value]
-                self.featureParams = {}
-            elif objectName == 'copyAudioChk' or objectName == 'overwriteChk':
-                self.generalParams[objectName] = value
-            else:
-                self.featureParams[objectName] = value
-
-    def getOutput(self, inputPath, suffix) -> dict:
-        inputFileName = Path(inputPath).stem
-        directory = Path(inputPath).parent
-        outputFileName = '{}_{}.mp4'.format(inputFileName, suffix)
-        outputFilePath = Path(directory).joinpath(outputFileName).__str__()
-        return {'name': outputFileName, 'path': outputFilePath}
-
-    def createCommand(self, events: dict) -> str:
-        self.setValueToState(events)
-
-        commandChain = ['ffmpeg']
-
-        if self.paths and len(self.paths) > 0:
-            inputPath = Path(self.paths[0]).__str__()
-            commandChain.append('-i "{}"'.format(inputPath))
-
-        if self.feature == 'FORMAT':
-            pass
-        elif self.feature == 'CUT':
-            fromTime = self.featureParams.get('fromTimeTbx')
-            if fromTime:
-                commandChain.append('-ss {}'.format(fromTime))
-            toTime = self.featureParams.get('toTimeTbx')
-            if toTime:
-                commandChain.append('-to {}'.format(toTime))
-        elif self.feature == 'CONCAT':
-            commandChain.insert(1, '-f concat')
-        elif self.feature == 'RMBLBAR':
-            blankRectangle = self.featureParams.get('blankRectangle') or ''
-            commandChain.append('-vf crop={}'.format(blankRectangle))
-        elif self.feature == 'ROTATE':
-            rotateModeGroup = self.featureParams.get('rotateModeGroup') or ''
-            commandChain.append('-vf transpose={}'.format(rotateModeGroup))
-        elif self.feature == 'CROP':
-            cropRectangle = self.featureParams.get('cropTbx') or ''
-            commandChain.append('-vf crop={}'.format(cropRectangle))
-
-        if self.generalParams.get('copyAudioChk'):
-            commandChain.append('-c:a copy')
-        if self.generalParams.get('overwriteChk'):
-            commandChain.append('-y')
-
-        if self.paths and len(self.paths) > 0:
-            output = self.getOutput(self.paths[0], self.feature)
-            commandChain.append('"{}"'.format(output.get('path')))
-
-        return ' '.join(commandChain)
-
-    def getBlankRectangle(self, input: str) -> str:
-        pos1 = input.rfind('crop=') + 5
-        pos2 = input.find('frame=', pos1)
-        blankRectangle = input[pos1:pos2].rstrip()
-        return blankRectangle
+    def setEncoderSettings(self, value) -> None:
+        self.commandCpn.commandOptionCpn.encoderSettingsTbx.setText(value)
+
+    def setTuning(self, tuning: bool) -> None:
+        self.commandCpn.commandOptionCpn.tuneEncoderBtn.setEnabled(not tuning)
+        self.commandCpn.commandOptionCpn.tuneEncoderBtn.setText('Tuning...' if tuning else 'Tune')
+
+    def setRemuxReport(self, value) -> None:
+        self.featureOptionCpn.formatFeatureOptionCpn.remuxReportLbl.setText(value)
+
+    def setPipeline(self, features) -> None:
+        labels = [META[feature]["label"] for feature in features]
+        self.featureSelectorCpn.pipelineLbl.setText(' -> '.join(labels))
+
+
+class JobNotifier(QObject):
+    # Job updates arrive on worker threads; the signal hands them over to
+    # the GUI thread.
+    changed = pyqtSignal(object)
+    cropDetected = pyqtSignal(object)
+    encoderTuned = pyqtSignal(object)
 
 
 class Controller():
@@ -208,35 +126,75 @@ class Controller():
         self.view.connectSignals(self.handleEvents)
         self.view.addDragDropFileHandler(self.handleDragDropFile)
 
-        self.process = None
-
-        self.log = ''
+        self.jobNotifier = JobNotifier()
+        self.jobNotifier.changed.connect(self.handleJobChange)
+        self.jobNotifier.cropDetected.connect(self.handleCropDetected)
+        self.jobNotifier.encoderTuned.connect(self.handleEncoderTuned)
+        journal = JobJournal(getCachePath('jobs.sqlite'))
+        unfinishedJobs = journal.loadUnfinished()
+        self.jobQueue = JobQueue(listener=self.jobNotifier.changed.emit,
+                                 outputCache=OutputCache(getCachePath('outputs')),
+                                 journal=journal,
+                                 metricsPath=getCachePath('metrics.jsonl'))
 
-        self.dialog = Dialog(self.view)
-        self.dialog.setModal(True)
-        self.dialog.connectSignals(self.handleDialogReject)
+        self.dialog = JobDialog(self.view)
+        self.dialog.connectSignals(self.handleDialogEvents)
 
         self.setInitialStates()
 
+        if unfinishedJobs:
+            answer = QMessageBox.question(
+                self.view, 'Unfinished jobs',
+                'Jobs left unfinished by an earlier session: {}. Run them again?'.format(len(unfinishedJobs)))
+            if answer == QMessageBox.Yes:
+                self.dialog.show()
+                self.jobQueue.submitJobs(unfinishedJobs)
+            else:
+                journal.discard(unfinishedJobs)
+
     def setInitialStates(self) -> None:
         self.view.commandCpn.commandOptionCpn.copyAudioChk.setChecked(True)
+        self.view.commandCpn.commandOptionCpn.useCacheChk.setChecked(True)
+        self.view.commandCpn.commandOptionCpn.maxJobsSpb.setValue(
+            self.jobQueue.maxWorkers)
         self.model.setValueToState({
-            'copyAudioChk': True
+            'copyAudioChk': True,
+            'useCacheChk': True,
+            'maxJobsSpb': self.jobQueue.maxWorkers,
         })
+        self.view.showFeatureOptions(self.model.feature)
 
     def handleEvents(self, value) -> None:
         objectName = self.view.sender().objectName()
 
         if objectName == 'executeBtn':
             command = self.view.getCommand()
-            self.executeCommand(command)
+            jobs = self.model.createJobs()
+            if command in [job.command for job in jobs]:
+                self.dialog.show()
+                self.jobQueue.submitJobs(jobs)
+            else:
+                for job in jobs:
+                    job.removeTempPaths()
+                self.executeCommand(command)
         elif objectName == 'cropBlankBtn':
             paths = self.model.paths
             if paths and len(paths) > 0:
-                command = 'ffmpeg -i {} -ss 60 -vframes 10 -vf cropdetect -f null -'.format(
-                    paths[0])
-                # self.view.setCommand(command)
-                self.executeCommand(command)
+                threading.Thread(target=lambda: self.jobNotifier.cropDetected.emit(
+                    self.model.detectBlankRectangle(paths[0])), daemon=True).start()
+        elif objectName == 'tuneEncoderBtn':
+            paths = self.model.paths
+            if paths and len(paths) > 0:
+                self.view.setTuning(True)
+                threading.Thread(target=self.tuneEncoder, args=(paths[0],), daemon=True).start()
+        elif objectName == 'savePresetBtn':
+            presetPath, _ = QFileDialog.getSaveFileName(
+                self.view, 'Save preset', '', 'Preset (*.json)')
+            if presetPath:
+                savePreset(presetPath, self.model.getPreset())
+        elif objectName == 'maxJobsSpb':
+            self.model.setValueToState({objectName: value})
+            self.jobQueue.setMaxWorkers(value)
         else:
             if objectName == 'featureSelectorCbb':
                 self.view.showFeatureOptions(list(META.keys())[value])
@@ -248,73 +206,139 @@ class Controller():
 
             command = self.model.createCommand({objectName: convertedValue})
             self.view.setCommand(command)
+            self.showRemuxReport()
+
+            if objectName in ('addPipelineBtn', 'clearPipelineBtn'):
+                self.view.setFeature(self.model.feature)
+                self.view.setPipeline(
+                    [feature for feature, _ in self.model.pipeline])
 
     def handleDragDropFile(self, paths) -> None:
+        getMetadataCache().prefetch(paths)
         command = self.model.createCommand({'dragDropFile': paths})
         self.view.setCommand(command)
+        self.showRemuxReport()
+
+    def showRemuxReport(self) -> None:
+        paths = self.model.paths
+        self.view.setRemuxReport(self.model.getRemuxReport(paths[0]) if paths else '')
+
+    def executeCommand(self, command: str, label: str = ''):
+        if not command.startswith('ffmpeg'):
+            return None
+        return self.executeJob(Job(command, label))
+
+    def executeJob(self, job: Job) -> Job:
+        self.dialog.show()
+        return self.jobQueue.submit(job)
+
+    def handleJobChange(self, job: Job) -> None:
+        self.dialog.updateJob(job)
+        if not job.isFinished():
+            return
+
+        if self.jobQueue.isFinished():
+            self.notifyFinished()
+
+    def notifyFinished(self) -> None:
+        if sys.platform == 'win32':
+            import winsound
+            winsound.MessageBeep(winsound.MB_OK)
+        else:
+            QApplication.beep()
 
-    def executeCommand(self, command: str) -> None:
-        self.process = QProcess()
-        self.process.readyReadStandardOutput.connect(self.handleOutput)
-        self.process.readyReadStandardError.connect(self.handleError)
-        self.process.stateChanged.connect(self.handleStateChange)
-        self.process.finished.connect(self.handleFinish)
-        if command.startswith('ffmpeg'):
-            self.process.start(command)
-
-    def handleOutput(self) -> None:
-        outputStream = self.process.readAllStandardOutput()
-        stdout = bytes(outputStream).decode('utf8')
-        self.log += stdout
-
-    def handleError(self) -> None:
-        errorStream = self.process.readAllStandardError()
-        stderr = bytes(errorStream).decode('utf8')
-        self.log += stderr
-
-    def handleStateChange(self, state) -> None:
-        if state == QProcess.ProcessState.NotRunning:
-            pass
-        elif state == QProcess.ProcessState.Starting:
-            self.log = ''
-            self.dialog.show()
-        elif state == QProcess.ProcessState.Running:
-            pass
-
-    def handleFinish(self) -> None:
-        self.dialog.reject()
-        self.process = None
-        winsound.MessageBeep(winsound.MB_OK)
-
-        if self.model.feature == 'RMBLBAR':
-            blankRectangle = self.model.getBlankRectangle(self.log)
+    def handleCropDetected(self, result) -> None:
+        blankRectangle, confidence = result
+        if blankRectangle and self.model.feature == 'RMBLBAR':
             command = self.model.createCommand(
                 {'blankRectangle': blankRectangle})
-            self.view.setBlankRectangle(blankRectangle)
+            self.view.setBlankRectangle(blankRectangle, confidence)
             self.view.setCommand(command)
 
-    def handleDialogReject(self) -> None:
-        self.dialog.reject()
-        self.process.kill()
-        self.process = None
+    def tuneEncoder(self, inputPath) -> None:
+        try:
+            result = self.model.tuneEncoder(inputPath)
+        except (OSError, subprocess.CalledProcessError):
+            result = None
+        self.jobNotifier.encoderTuned.emit(result)
+
+    def handleEncoderTuned(self, result) -> None:
+        self.view.setTuning(False)
+        if result:
+            encoderSettings, _ = result
+            self.view.setEncoderSettings(encoderSettings)
+
+    def handleDialogEvents(self) -> None:
+        objectName = self.dialog.sender().objectName()
 
+        if objectName == 'cancelJobBtn':
+            selectedIds = self.dialog.getSelectedJobIds()
+            for job in self.jobQueue.jobs:
+                if job.id in selectedIds:
+                    self.jobQueue.cancel(job)
+        elif objectName == 'cancelAllJobBtn':
+            self.jobQueue.cancelAll()
+
+
+class JobDialog(QDialog):
+    COLUMNS = ('File', 'Status', 'Progress', 'FPS', 'Speed', 'ETA')
 
-class Dialog(QDialog):
     def __init__(self, parent) -> None:
         super().__init__(parent)
+        self.setWindowTitle('Jobs')
         self.layout = QVBoxLayout()
 
-        label = QLabel("FFmpeg command is executing")
-        self.layout.addWidget(label)
-
-        self.buttonBox = QDialogButtonBox(
-            QDialogButtonBox.StandardButton.Cancel)
-        self.layout.addWidget(self.buttonBox)
+        self.jobTable = QTableWidget(0, len(self.COLUMNS))
+        self.jobTable.setHorizontalHeaderLabels(self.COLUMNS)
+        self.jobTable.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.jobTable.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.jobTable.horizontalHeader().setStretchLastSection(True)
+        self.jobTable.setMinimumWidth(500)
+        self.layout.addWidget(self.jobTable)
+
+        buttonLayout = QHBoxLayout()
+        buttonLayout.addStretch()
+        self.cancelJobBtn = QPushButton('Cancel selected')
+        self.cancelJobBtn.setObjectName('cancelJobBtn')
+        buttonLayout.addWidget(self.cancelJobBtn)
+        self.cancelAllJobBtn = QPushButton('Cancel all')
+        self.cancelAllJobBtn.setObjectName('cancelAllJobBtn')
+        buttonLayout.addWidget(self.cancelAllJobBtn)
+        self.layout.addLayout(buttonLayout)
 
         self.setLayout(self.layout)
 
+        self.jobIds = []
+
     def connectSignals(self, handler) -> None:
-        self.buttonBox.rejected.connect(handler)
+        self.cancelJobBtn.clicked.connect(handler)
+        self.cancelAllJobBtn.clicked.connect(handler)
+
+    def updateJob(self, job) -> None:
+        if job.id in self.jobIds:
+            row = self.jobIds.index(job.id)
+        else:
+            row = len(self.jobIds)
+            self.jobIds.append(job.id)
+            self.jobTable.insertRow(row)
+            self.jobTable.setItem(row, 0, QTableWidgetItem(job.label))
+        percent = job.getPercent()
+        fps = job.progress.get('fps')
+        speed = job.progress.get('speed')
+        eta = job.getEta() if job.status == job.RUNNING else None
+        values = (
+            'cached' if job.cached else job.status,
+            '{:.1f}%'.format(percent) if percent is not None else '',
+            '{:.1f}'.format(fps) if fps is not None else '',
+            '{:.2f}x'.format(speed) if speed is not None else '',
+            formatTime(eta) if eta is not None else '',
+        )
+        for column, value in enumerate(values, 1):
+            self.jobTable.setItem(row, column, QTableWidgetItem(value))
+
+    def getSelectedJobIds(self) -> list:
+        rows = {index.row() for index in self.jobTable.selectedIndexes()}
+        return [self.jobIds[row] for row in rows]
 
 
 class DragDropFileWidget(QWidget):
@@ -374,9 +398,15 @@ class CommandComponent(Component):
         self.commandOptionCpn = CommandOptionComponent()
         self.layout.addWidget(self.commandOptionCpn, 1, 0)
 
+        self.savePresetBtn = QPushButton('Save preset')
+        self.savePresetBtn.setObjectName('savePresetBtn')
+        self.savePresetBtn.setToolTip('For video_engine.py --preset, e.g. with --watch')
+        self.layout.addWidget(self.savePresetBtn, 1, 1)
+
     def _connectSignals(self, handler) -> None:
         self.commandTxb.textChanged.connect(handler)
         self.executeBtn.clicked.connect(handler)
+        self.savePresetBtn.clicked.connect(handler)
         self.commandOptionCpn._connectSignals(handler)
 
 
@@ -394,11 +424,47 @@ class CommandOptionComponent(Component):
         self.overwriteChk.setObjectName('overwriteChk')
         self.layout.addWidget(self.overwriteChk)
 
+        self.useCacheChk = QCheckBox('Reuse cached outputs')
+        self.useCacheChk.setObjectName('useCacheChk')
+        self.layout.addWidget(self.useCacheChk)
+
+        self.maxJobsSpb = QSpinBox()
+        self.maxJobsSpb.setObjectName('maxJobsSpb')
+        self.maxJobsSpb.setRange(1, 64)
+        maxJobsSubLayout = QFormLayout()
+        maxJobsSubLayout.addRow('Parallel jobs:', self.maxJobsSpb)
+        self.layout.addLayout(maxJobsSubLayout)
+
+        self.segmentsSpb = QSpinBox()
+        self.segmentsSpb.setObjectName('segmentsSpb')
+        self.segmentsSpb.setRange(1, 64)
+        self.segmentsSpb.setToolTip('Split each input at keyframes and encode the parts in parallel')
+        segmentsSubLayout = QFormLayout()
+        segmentsSubLayout.addRow('Segments:', self.segmentsSpb)
+        self.layout.addLayout(segmentsSubLayout)
+
+        self.encoderSettingsTbx = QLineEdit()
+        self.encoderSettingsTbx.setObjectName('encoderSettingsTbx')
+        self.encoderSettingsTbx.setPlaceholderText('ffmpeg defaults')
+        encoderSettingsSubLayout = QFormLayout()
+        encoderSettingsSubLayout.addRow('Encoder:', self.encoderSettingsTbx)
+        self.layout.addLayout(encoderSettingsSubLayout)
+
+        self.tuneEncoderBtn = QPushButton('Tune')
+        self.tuneEncoderBtn.setObjectName('tuneEncoderBtn')
+        self.tuneEncoderBtn.setToolTip('Try x264 presets and CRFs on a sample of the first file')
+        self.layout.addWidget(self.tuneEncoderBtn)
+
         self.layout.addStretch()
 
     def _connectSignals(self, handler) -> None:
         self.copyAudioChk.toggled.connect(handler)
         self.overwriteChk.toggled.connect(handler)
+        self.useCacheChk.toggled.connect(handler)
+        self.maxJobsSpb.valueChanged.connect(handler)
+        self.segmentsSpb.valueChanged.connect(handler)
+        self.encoderSettingsTbx.textChanged.connect(handler)
+        self.tuneEncoderBtn.clicked.connect(handler)
 
 
 class FeatureSelectorComponent(Component):
@@ -413,10 +479,24 @@ class FeatureSelectorComponent(Component):
             [META[key]["label"] for key in META])
         self.layout.addWidget(self.featureSelectorCbb)
 
+        self.addPipelineBtn = QPushButton('Add to pipeline')
+        self.addPipelineBtn.setObjectName('addPipelineBtn')
+        self.layout.addWidget(self.addPipelineBtn)
+
+        self.pipelineLbl = QLabel()
+        self.pipelineLbl.setWordWrap(True)
+        self.layout.addWidget(self.pipelineLbl)
+
+        self.clearPipelineBtn = QPushButton('Clear pipeline')
+        self.clearPipelineBtn.setObjectName('clearPipelineBtn')
+        self.layout.addWidget(self.clearPipelineBtn)
+
         self.layout.addStretch()
 
     def _connectSignals(self, handler) -> None:
         self.featureSelectorCbb.activated[int].connect(handler)
+        self.addPipelineBtn.clicked.connect(handler)
+        self.clearPipelineBtn.clicked.connect(handler)
 
 
 class FeatureOptionComponent(Component):
@@ -425,6 +505,9 @@ class FeatureOptionComponent(Component):
         self.layout.setContentsMargins(0, 0, 0, 0)
 
     def _createWidgets(self) -> None:
+        self.formatFeatureOptionCpn = FormatFeatureOptionComponent()
+        self.layout.addWidget(self.formatFeatureOptionCpn)
+
         self.cutFeatureOptionCpn = CutFeatureOptionComponent()
         self.layout.addWidget(self.cutFeatureOptionCpn)
 
@@ -440,6 +523,7 @@ class FeatureOptionComponent(Component):
         self.hideAllWidgets()
 
     def _connectSignals(self, handler) -> None:
+        self.formatFeatureOptionCpn._connectSignals(handler)
         self.cutFeatureOptionCpn._connectSignals(handler)
         self.rmBlBarFeatureOptionCpn._connectSignals(handler)
         self.cropFeatureOptionCpn._connectSignals(handler)
@@ -447,7 +531,9 @@ class FeatureOptionComponent(Component):
 
     def showFeatureOptions(self, feature) -> None:
         self.hideAllWidgets()
-        if feature == 'CUT':
+        if feature == 'FORMAT':
+            self.formatFeatureOptionCpn.show()
+        elif feature == 'CUT':
             self.cutFeatureOptionCpn.show()
         elif feature == 'RMBLBAR':
             self.rmBlBarFeatureOptionCpn.show()
@@ -457,12 +543,26 @@ class FeatureOptionComponent(Component):
             self.rotateFeatureOptionCpn.show()
 
     def hideAllWidgets(self) -> None:
+        self.formatFeatureOptionCpn.hide()
         self.cutFeatureOptionCpn.hide()
         self.rmBlBarFeatureOptionCpn.hide()
         self.cropFeatureOptionCpn.hide()
         self.rotateFeatureOptionCpn.hide()
 
 
+class FormatFeatureOptionComponent(Component):
+    def _createWidgets(self) -> None:
+        self.remuxChk = QCheckBox('Copy compatible streams (remux)')
+        self.remuxChk.setObjectName('remuxChk')
+        self.layout.addWidget(self.remuxChk, 0, 0)
+
+        self.remuxReportLbl = QLabel()
+        self.layout.addWidget(self.remuxReportLbl, 1, 0)
+
+    def _connectSignals(self, handler) -> None:
+        self.remuxChk.toggled.connect(handler)
+
+
 class CutFeatureOptionComponent(Component):
     def _createWidgets(self) -> None:
         self.fromTimeTbx = QTimeEdit()
@@ -479,9 +579,19 @@ class CutFeatureOptionComponent(Component):
         toTimeSubLayout.addRow('To:', self.toTimeTbx)
         self.layout.addLayout(toTimeSubLayout, 0, 1)
 
+        self.accurateSeekChk = QCheckBox('Frame-accurate seek (slow)')
+        self.accurateSeekChk.setObjectName('accurateSeekChk')
+        self.layout.addWidget(self.accurateSeekChk, 1, 0, 1, 2)
+
+        self.smartCutChk = QCheckBox('Smart cut (copy between keyframes)')
+        self.smartCutChk.setObjectName('smartCutChk')
+        self.layout.addWidget(self.smartCutChk, 2, 0, 1, 2)
+
     def _connectSignals(self, handler) -> None:
         self.fromTimeTbx.timeChanged.connect(handler)
         self.toTimeTbx.timeChanged.connect(handler)
+        self.accurateSeekChk.toggled.connect(handler)
+        self.smartCutChk.toggled.connect(handler)
 
 
 class RmBlBarFeatureOptionComponent(Component):
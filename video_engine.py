@@ -0,0 +1,1903 @@
+import argparse
+import codecs
+import collections
+import ctypes
+import ctypes.util
+import functools
+import hashlib
+import itertools
+import json
+import os
+import re
+import select
+import shlex
+import shutil
+import socket
+import sqlite3
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+META = {
+    "FORMAT": {
+        "label": "Format",
+    },
+    "CUT": {
+        "label": "Cut",
+        "stackable": True,
+    },
+    "CONCAT": {
+        "label": "Concatenate",
+    },
+    "RMBLBAR": {
+        "label": "Remove blank bar",
+        "stackable": True,
+    },
+    "ROTATE": {
+        "label": "Rotate",
+        "stackable": True,
+    },
+    "CROP": {
+        "label": "Crop",
+        "stackable": True,
+    },
+}
+
+ROTATE_MODE = (
+    {
+        "value": 1,
+        "label": "Rotate 90deg",
+    },
+    {
+        "value": 2,
+        "label": "Rotate -90deg",
+    },
+    {
+        "value": 3,
+        "label": "Rotate 90deg and flip vertically",
+    },
+    {
+        "value": 4,
+        "label": "Rotate -90deg and flip vertically",
+    },
+)
+
+# Encoders used to re-encode the partial GOPs of a smart cut, by source codec.
+# Only codecs MPEG-TS can carry, since the pieces are joined as TS.
+VIDEO_ENCODERS = {
+    "h264": "libx264",
+    "hevc": "libx265",
+    "mpeg4": "mpeg4",
+}
+
+AUDIO_ENCODERS = {
+    "aac": "aac",
+    "mp3": "libmp3lame",
+    "opus": "libopus",
+    "ac3": "ac3",
+}
+
+# Codecs the mp4 output holds as they are, and what the others become.
+CONTAINER_CODECS = {
+    "video": ("h264", "hevc", "mpeg4", "av1", "vp9"),
+    "audio": ("aac", "mp3", "ac3", "eac3", "opus", "alac", "flac"),
+    "subtitle": ("mov_text",),
+}
+
+STREAM_ENCODERS = {
+    "video": "libx264",
+    "audio": "aac",
+    "subtitle": "mov_text",
+}
+
+TEXT_SUBTITLE_CODECS = ("subrip", "ass", "ssa", "webvtt", "text")
+
+
+def runProbe(arguments: list) -> str:
+    result = subprocess.run(['ffprobe', '-v', 'error'] + arguments, stdin=subprocess.DEVNULL,
+                            capture_output=True, check=True)
+    return result.stdout.decode('utf8', 'replace')
+
+
+def readMedia(inputPath) -> dict:
+    output = runProbe(['-show_entries',
+                       'format=duration,start_time,format_name:stream=index,codec_type,codec_name,profile,pix_fmt,'
+                       'width,height,r_frame_rate,time_base,sample_rate,channels:'
+                       'stream_disposition=attached_pic',
+                       '-of', 'json', str(inputPath)])
+    probed = json.loads(output)
+    return {
+        'duration': parseTime((probed.get('format') or {}).get('duration', '')),
+        'startTime': parseTime((probed.get('format') or {}).get('start_time', '')) or 0.0,
+        'formatName': (probed.get('format') or {}).get('format_name', ''),
+        'streams': probed.get('streams') or [],
+    }
+
+
+def getStream(media: dict, codecType: str) -> dict:
+    for stream in media['streams']:
+        if stream.get('codec_type') == codecType:
+            return stream
+    return None
+
+
+def readKeyframes(inputPath, start: float, end: float, startTime: float = 0.0) -> list:
+    # Reads packet flags only, so nothing is decoded. ffprobe works in the
+    # file's own timestamps, while -ss and the cut times count from its
+    # start time, so the times are shifted both ways.
+    interval = '{}%{}'.format(start + startTime, '' if end is None else end + startTime)
+    output = runProbe(['-select_streams', 'v:0', '-read_intervals', interval,
+                       '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', str(inputPath)])
+    keyframes = []
+    for line in output.splitlines():
+        ptsTime, _, flags = line.partition(',')
+        if 'K' in flags and parseTime(ptsTime) is not None:
+            keyframes.append(parseTime(ptsTime) - startTime)
+    return sorted(keyframes)
+
+
+def getCachePath(name: str) -> Path:
+    root = os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME') or Path.home().joinpath('.cache')
+    return Path(root).joinpath('video_editor', name)
+
+
+class MetadataCache():
+    # ffprobe results keyed by path, size and mtime. Keyframe indexes are kept
+    # per probed range, since reading the whole file for them can be slow.
+    # VERSION goes up whenever readMedia reads more, dropping older entries.
+    VERSION = 3
+
+    def __init__(self, databasePath=None):
+        self.databasePath = databasePath
+        self.medias = {}
+        self.lock = threading.Lock()
+        self.pathLocks = collections.defaultdict(threading.Lock)
+        self.executor = None
+        try:
+            with self.connect() as connection:
+                if connection.execute('PRAGMA user_version').fetchone()[0] != self.VERSION:
+                    connection.execute('DROP TABLE IF EXISTS media')
+                    connection.execute('DROP TABLE IF EXISTS keyframes')
+                    connection.execute('PRAGMA user_version = {}'.format(self.VERSION))
+                connection.execute('CREATE TABLE IF NOT EXISTS media (path TEXT PRIMARY KEY, size INTEGER, '
+                                   'mtime INTEGER, data TEXT)')
+                connection.execute('CREATE TABLE IF NOT EXISTS keyframes (path TEXT, start REAL, end REAL, '
+                                   'data TEXT, PRIMARY KEY (path, start, end))')
+        except (OSError, sqlite3.Error):
+            self.databasePath = None
+
+    def connect(self):
+        if not self.databasePath:
+            raise sqlite3.OperationalError('no metadata database')
+        Path(self.databasePath).parent.mkdir(parents=True, exist_ok=True)
+        return sqlite3.connect(str(self.databasePath), timeout=10)
+
+    def getKey(self, inputPath) -> tuple:
+        path = os.path.abspath(inputPath)
+        stat = os.stat(path)
+        return path, stat.st_size, stat.st_mtime_ns
+
+    def load(self, key) -> dict:
+        path, size, mtime = key
+        try:
+            with self.connect() as connection:
+                row = connection.execute('SELECT data FROM media WHERE path = ? AND size = ? AND mtime = ?',
+                                         key).fetchone()
+                if row is None:
+                    connection.execute('DELETE FROM media WHERE path = ?', (path,))
+                    connection.execute('DELETE FROM keyframes WHERE path = ?', (path,))
+                    return None
+        except sqlite3.Error:
+            return None
+        return json.loads(row[0])
+
+    def store(self, key, media: dict) -> None:
+        try:
+            with self.connect() as connection:
+                connection.execute('INSERT OR REPLACE INTO media VALUES (?, ?, ?, ?)', key + (json.dumps(media),))
+        except sqlite3.Error:
+            pass
+
+    def getMedia(self, inputPath) -> dict:
+        key = self.getKey(inputPath)
+        with self.pathLocks[key[0]]:
+            with self.lock:
+                media = self.medias.get(key)
+            if media is None:
+                media = self.load(key)
+                if media is None:
+                    media = readMedia(inputPath)
+                    self.store(key, media)
+                with self.lock:
+                    self.medias[key] = media
+        return media
+
+    def getKeyframes(self, inputPath, start: float, end: float) -> list:
+        media = self.getMedia(inputPath)
+        path = self.getKey(inputPath)[0]
+        end = float('inf') if end is None else end
+        try:
+            with self.connect() as connection:
+                rows = connection.execute('SELECT start, end, data FROM keyframes WHERE path = ? '
+                                          'AND start <= ? AND end >= ?', (path, start, end)).fetchall()
+        except sqlite3.Error:
+            rows = []
+        if rows:
+            return [keyframe for keyframe in json.loads(rows[0][2]) if start <= keyframe <= end]
+        keyframes = readKeyframes(inputPath, start, None if end == float('inf') else end,
+                                  media.get('startTime', 0.0))
+        try:
+            with self.connect() as connection:
+                connection.execute('INSERT OR REPLACE INTO keyframes VALUES (?, ?, ?, ?)',
+                                   (path, start, end, json.dumps(keyframes)))
+        except sqlite3.Error:
+            pass
+        return keyframes
+
+    def prefetch(self, paths) -> None:
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1),
+                                                   thread_name_prefix='probe')
+        for path in paths:
+            self.executor.submit(self.getMedia, path)
+
+
+metadataCache = None
+metadataCacheLock = threading.Lock()
+
+
+def getMetadataCache() -> MetadataCache:
+    # Opened on first use, so importing the engine touches no files.
+    global metadataCache
+    with metadataCacheLock:
+        if metadataCache is None:
+            metadataCache = MetadataCache(getCachePath('metadata.sqlite'))
+    return metadataCache
+
+
+def probeMedia(inputPath) -> dict:
+    return getMetadataCache().getMedia(inputPath)
+
+
+def probeVideoStream(inputPath) -> dict:
+    return getStream(probeMedia(inputPath), 'video') or {}
+
+
+def probeKeyframes(inputPath, start: float, end: float) -> list:
+    return getMetadataCache().getKeyframes(inputPath, start, end)
+
+
+def writeConcatList(listPath, paths: list) -> None:
+    # The concat demuxer resolves relative entries against the list's own
+    # directory, so every entry is written absolute.
+    with open(listPath, 'w', encoding='utf8') as listFile:
+        for path in paths:
+            listFile.write("file '{}'\n".format(os.path.abspath(path).replace("'", "'\\''")))
+
+
+class Model():
+    def __init__(self) -> None:
+        self.metaKeys = list(META.keys())
+        self.paths = []
+        self.feature = self.metaKeys[0]
+        self.generalParams = {}
+        self.featureParams = {}
+        # Stacked (feature, featureParams) operations, applied in order
+        # before the current feature in a single ffmpeg run.
+        self.pipeline = []
+
+    def setValueToState(self, events: dict) -> None:
+        for objectName, value in events.items():
+            if objectName == 'dragDropFile':
+                self.paths = value
+            elif objectName == 'featureSelectorCbb':
+                self.feature = self.metaKeys[value]
+                self.featureParams = {}
+            elif objectName in ('copyAudioChk', 'overwriteChk', 'useCacheChk', 'maxJobsSpb', 'segmentsSpb',
+                                'encoderSettingsTbx'):
+                self.generalParams[objectName] = value
+            elif objectName == 'addPipelineBtn':
+                if META[self.feature].get('stackable'):
+                    self.pipeline.append((self.feature, dict(self.featureParams)))
+                    self.feature = self.metaKeys[0]
+                    self.featureParams = {}
+            elif objectName == 'clearPipelineBtn':
+                self.pipeline = []
+            else:
+                self.featureParams[objectName] = value
+
+    def getOutput(self, inputPath, suffix) -> dict:
+        inputFileName = Path(inputPath).stem
+        directory = Path(inputPath).parent
+        outputFileName = '{}_{}.mp4'.format(inputFileName, suffix)
+        outputFilePath = Path(directory).joinpath(outputFileName).__str__()
+        return {'name': outputFileName, 'path': outputFilePath}
+
+    def createCommand(self, events: dict) -> str:
+        self.setValueToState(events)
+        inputPath = self.paths[0] if self.paths else None
+        return self.buildCommand(inputPath)
+
+    def createCommands(self) -> list:
+        if self.feature == 'CONCAT':
+            return [(self.paths[0], self.buildCommand(self.paths[0]))] if self.paths else []
+        return [(path, self.buildCommand(path)) for path in self.paths]
+
+    def buildCommand(self, inputPath) -> str:
+        commandChain = ['ffmpeg']
+
+        if inputPath:
+            commandChain.append('-i "{}"'.format(Path(inputPath).__str__()))
+
+        if self.feature == 'CONCAT':
+            if inputPath:
+                commandChain[1] = '-f concat -safe 0 -i "{}"'.format(
+                    self.getConcatListPath(inputPath))
+            commandChain.append('-map 0 -c copy')
+        else:
+            seekChain = []
+            fromTime, toTime = self.getCutRange()
+            if fromTime:
+                seekChain.append('-ss {}'.format(formatSeekTime(fromTime)))
+            if toTime is not None:
+                seekChain.append('-to {}'.format(formatSeekTime(toTime)))
+            if any(params.get('accurateSeekChk') for feature, params in self.getOperations()
+                   if feature == 'CUT'):
+                commandChain.extend(seekChain)
+            else:
+                # Input seeking jumps to the nearest keyframe instead of
+                # decoding and dropping everything before the cut.
+                commandChain[1:1] = seekChain
+            filters = self.getFilters()
+            if filters:
+                commandChain.append('-vf {}'.format(','.join(filters)))
+            encoderSettings = self.generalParams.get('encoderSettingsTbx')
+            remuxPlan = self.getRemuxPlan(inputPath)
+            # A remux only needs them when it re-encodes the video.
+            if encoderSettings and (remuxPlan is None or any(
+                    stream['type'] == 'video' and stream['action'] == STREAM_ENCODERS['video']
+                    for stream in remuxPlan)):
+                commandChain.append(encoderSettings)
+
+        remuxPlan = self.getRemuxPlan(inputPath)
+        if remuxPlan:
+            commandChain.append(self.buildRemuxOptions(remuxPlan))
+        elif self.generalParams.get('copyAudioChk') and self.feature != 'CONCAT':
+            commandChain.append('-c:a copy')
+        if self.generalParams.get('overwriteChk'):
+            commandChain.append('-y')
+
+        if inputPath:
+            output = self.getOutput(inputPath, self.getOutputSuffix())
+            commandChain.append('"{}"'.format(output.get('path')))
+
+        return ' '.join(commandChain)
+
+    def getRemuxPlan(self, inputPath) -> list:
+        # Which streams of a plain FORMAT can be copied into the output, and
+        # which need re-encoding or cannot go in at all. None when the mode is
+        # off or the input cannot be probed.
+        if not (inputPath and self.feature == 'FORMAT' and not self.pipeline
+                and self.featureParams.get('remuxChk')):
+            return None
+        try:
+            media = probeMedia(inputPath)
+        except (OSError, ValueError, subprocess.CalledProcessError):
+            return None
+        plan = []
+        for stream in media['streams']:
+            codecType, codecName = stream.get('codec_type'), stream.get('codec_name')
+            if (stream.get('disposition') or {}).get('attached_pic'):
+                # Cover art, not a video track.
+                action = None
+            elif codecName in CONTAINER_CODECS.get(codecType, ()):
+                action = 'copy'
+            elif codecType in ('video', 'audio'):
+                action = STREAM_ENCODERS[codecType]
+            elif codecType == 'subtitle' and codecName in TEXT_SUBTITLE_CODECS:
+                action = STREAM_ENCODERS[codecType]
+            else:
+                action = None
+            plan.append({'index': stream.get('index'), 'type': codecType,
+                         'codec': codecName, 'action': action})
+        return plan
+
+    def buildRemuxOptions(self, plan: list) -> str:
+        options = []
+        outputIndex = 0
+        for stream in plan:
+            if stream['action'] is None:
+                continue
+            options.append('-map 0:{} -c:{} {}'.format(stream['index'], outputIndex, stream['action']))
+            if stream['action'] == 'copy' and stream['codec'] == 'hevc':
+                options.append('-tag:{} hvc1'.format(outputIndex))
+            outputIndex += 1
+        return ' '.join(options)
+
+    def getRemuxReport(self, inputPath) -> str:
+        lines = []
+        for stream in self.getRemuxPlan(inputPath) or []:
+            action = stream['action']
+            lines.append('#{} {} {}: {}'.format(
+                stream['index'], stream['type'], stream['codec'],
+                'dropped' if action is None else action if action == 'copy' else 'encode to ' + action))
+        return '\n'.join(lines)
+
+    def getPreset(self) -> list:
+        # The events that rebuild the current state, as loadPreset reads them.
+        events = [dict(self.generalParams)]
+        for feature, params in self.pipeline:
+            events.extend([{'featureSelectorCbb': self.metaKeys.index(feature)}, dict(params),
+                           {'addPipelineBtn': True}])
+        events.append({'featureSelectorCbb': self.metaKeys.index(self.feature)})
+        events.append({key: value for key, value in self.featureParams.items() if key != 'commandTbx'})
+        return events
+
+    def getOperations(self) -> list:
+        operations = list(self.pipeline)
+        if META[self.feature].get('stackable'):
+            operations.append((self.feature, self.featureParams))
+        return operations
+
+    def getOutputSuffix(self) -> str:
+        return '_'.join(feature for feature, _ in self.getOperations()) or self.feature
+
+    def getFilters(self) -> list:
+        # One chained -vf graph, in the order the operations were stacked.
+        filters = []
+        for feature, params in self.getOperations():
+            if feature == 'RMBLBAR':
+                filters.append('crop={}'.format(params.get('blankRectangle') or ''))
+            elif feature == 'ROTATE':
+                filters.append('transpose={}'.format(params.get('rotateModeGroup') or ''))
+            elif feature == 'CROP':
+                filters.append('crop={}'.format(params.get('cropTbx') or ''))
+        return filters
+
+    def createJobs(self) -> list:
+        if self.feature == 'CONCAT':
+            return self.createConcatJobs()
+        segmentCount = self.generalParams.get('segmentsSpb') or 1
+        operations = self.getOperations()
+        smartCut = (operations and all(feature == 'CUT' for feature, _ in operations)
+                    and any(params.get('smartCutChk') for _, params in operations))
+        jobs = []
+        for path, command in self.createCommands():
+            pathJobs = None
+            variant = ''
+            if smartCut:
+                smartCutJob = self.createSmartCutJob(path, command)
+                pathJobs = [smartCutJob] if smartCutJob else None
+                variant = 'smartcut'
+            elif segmentCount > 1 and self.getRemuxPlan(path) is None:
+                # A remux copies the streams, there is nothing to split.
+                pathJobs = self.createSegmentedJobs(path, command, segmentCount)
+                variant = 'segments'
+            if not pathJobs:
+                pathJobs = [Job(command, Path(path).name, self.getOutputDuration(path))]
+                variant = ''
+            self.setJobOutput(pathJobs[-1], [path], variant)
+            jobs.extend(pathJobs)
+        return jobs
+
+    def setJobOutput(self, job, inputPaths: list, variant: str = '') -> None:
+        job.outputPath = self.getOutput(inputPaths[0], self.getOutputSuffix())['path']
+        job.inputPaths = list(inputPaths)
+        job.variant = variant
+        job.useCache = bool(self.generalParams.get('useCacheChk'))
+
+    def getCutRange(self) -> tuple:
+        # Stacked cuts apply one after another, so each range is relative to
+        # the output of the previous one.
+        fromTime, toTime = 0, None
+        for feature, params in self.getOperations():
+            if feature != 'CUT':
+                continue
+            start = parseTime(params.get('fromTimeTbx') or 0) or 0
+            end = parseTime(params.get('toTimeTbx') or '') or None
+            if end is not None:
+                end += fromTime
+                toTime = end if toTime is None else min(toTime, end)
+            fromTime += start
+        return fromTime, toTime
+
+    def getOutputDuration(self, inputPath=None) -> float:
+        fromTime, toTime = self.getCutRange()
+        if toTime is None and inputPath is not None:
+            try:
+                toTime = probeMedia(inputPath)['duration']
+            except (OSError, ValueError, subprocess.CalledProcessError):
+                pass
+        if toTime is None:
+            return None
+        return max(toTime - fromTime, 0)
+
+    def getMatchingEncodeOptions(self, stream: dict) -> str:
+        encoder = VIDEO_ENCODERS[stream['codec_name']]
+        options = ['-c:v {}'.format(encoder)]
+        if stream.get('pix_fmt'):
+            options.append('-pix_fmt {}'.format(stream['pix_fmt']))
+        if stream.get('r_frame_rate'):
+            options.append('-r {}'.format(stream['r_frame_rate']))
+        profile = (stream.get('profile') or '').lower().replace('constrained ', '').replace(' ', '')
+        if encoder == 'libx264' and profile:
+            options.append('-profile:v {}'.format(profile))
+        if encoder in ('libx264', 'libx265'):
+            options.append('-crf 18')
+        return ' '.join(options)
+
+    def createSmartCutJob(self, inputPath, command: str):
+        # Stream-copies the whole GOPs inside the cut and re-encodes only the
+        # partial GOPs at both edges. Pieces are MPEG-TS so that the edges
+        # carry their own codec headers, and are joined by the concat demuxer.
+        # The audio is taken in one separate pass, as for segments, so the
+        # pieces' durations are those of their video alone.
+        # Returns None when the input cannot be cut this way.
+        fromTime, toTime = self.getCutRange()
+        if toTime is None or toTime <= fromTime:
+            return None
+        try:
+            media = probeMedia(inputPath)
+            # Seeking in MPEG-TS can land past the keyframe asked for, which
+            # would lose frames at the edges.
+            if 'mpegts' in media.get('formatName', '').split(','):
+                return None
+            stream = getStream(media, 'video') or {}
+            if stream.get('codec_name') not in VIDEO_ENCODERS:
+                return None
+            keyframes = [keyframe for keyframe in probeKeyframes(inputPath, fromTime, toTime)
+                         if fromTime <= keyframe <= toTime]
+        except (OSError, ValueError, subprocess.CalledProcessError):
+            return None
+        if len(keyframes) < 2:
+            return None
+
+        output = self.getOutput(inputPath, self.getOutputSuffix())
+        tempDirectory = tempfile.mkdtemp(prefix='smartcut_', dir=Path(output['path']).parent)
+        # The edges keep the source timestamps; -r would duplicate a frame
+        # when the cut is off the frame grid.
+        edgeOptions = self.getMatchingEncodeOptions(dict(stream, r_frame_rate=None)) + ' -fps_mode passthrough'
+        # With B-frames ffmpeg seeks up to 3/23 s before -ss, which would
+        # start the copy a whole GOP early, so the copy seeks a little past
+        # its keyframe. -t counts decoding timestamps, so the copy also stops
+        # after the frames that lie between the two keyframes.
+        copySeek = keyframes[0] + min(0.2, (keyframes[1] - keyframes[0]) / 2)
+        copyOptions = '-c:v copy'
+        numerator, _, denominator = stream.get('r_frame_rate', '').partition('/')
+        try:
+            frameRate = float(numerator) / float(denominator or 1)
+        except (ValueError, ZeroDivisionError):
+            frameRate = None
+        if frameRate:
+            copyOptions += ' -frames:v {}'.format(round((keyframes[-1] - keyframes[0]) * frameRate))
+        pieces = [
+            (fromTime, fromTime, keyframes[0], edgeOptions),
+            (keyframes[0], copySeek, keyframes[-1], copyOptions),
+            (keyframes[-1], keyframes[-1], toTime, edgeOptions),
+        ]
+        steps = []
+        piecePaths = []
+        for start, seek, end, videoOptions in pieces:
+            if end - start < 0.001:
+                continue
+            piecePath = Path(tempDirectory).joinpath('{}.ts'.format(len(piecePaths))).__str__()
+            piecePaths.append(piecePath)
+            # Pieces go to a private temp directory, so -y only replaces what
+            # an interrupted run left there.
+            steps.append(('ffmpeg -ss {:.6f} -i "{}" -t {:.6f} -map 0:v:0 -an {} -f mpegts -y "{}"'.format(
+                seek, Path(inputPath).__str__(), end - seek, videoOptions, piecePath), end - start))
+
+        joinChain = []
+        if getStream(media, 'audio'):
+            audioPath = Path(tempDirectory).joinpath('audio.mka').__str__()
+            audioCodec = ' -c:a copy' if self.generalParams.get('copyAudioChk') else ' -c:a aac'
+            steps.append(('ffmpeg -ss {:.6f} -i "{}" -t {:.6f} -map 0:a -vn{} -y "{}"'.format(
+                fromTime, Path(inputPath).__str__(), toTime - fromTime, audioCodec, audioPath),
+                toTime - fromTime))
+            joinChain.append('-i "{}" -map 0:v -map 1:a'.format(audioPath))
+        listPath = Path(tempDirectory).joinpath('list.txt').__str__()
+        writeConcatList(listPath, piecePaths)
+        joinChain.append('-c copy')
+        if self.generalParams.get('overwriteChk'):
+            joinChain.append('-y')
+        joinChain.append('"{}"'.format(output['path']))
+        steps.append(('ffmpeg -f concat -safe 0 -i "{}" {}'.format(listPath, ' '.join(joinChain)),
+                      toTime - fromTime))
+
+        job = Job(command, Path(inputPath).name, steps=steps)
+        job.tempPaths.append(tempDirectory)
+        return job
+
+    def getSplitPoints(self, keyframes: list, start: float, end: float, count: int) -> list:
+        points = [start]
+        for index in range(1, count):
+            target = start + (end - start) * index / count
+            point = min(keyframes, key=lambda keyframe: abs(keyframe - target)) if keyframes else target
+            if points[-1] < point < end:
+                points.append(point)
+        return points + [end]
+
+    def createSegmentedJobs(self, inputPath, command: str, segmentCount: int) -> list:
+        # Splits the range at keyframes, encodes the segments in parallel
+        # jobs with the same filters, takes the audio in one separate pass so
+        # there are no gaps at the joins, and stream-copies everything into
+        # the output. Returns None when the input cannot be split.
+        fromTime, toTime = self.getCutRange()
+        try:
+            media = probeMedia(inputPath)
+            end = toTime if toTime is not None else media['duration']
+            if not end or end <= fromTime:
+                return None
+            keyframes = probeKeyframes(inputPath, fromTime, end)
+        except (OSError, ValueError, subprocess.CalledProcessError):
+            return None
+        points = self.getSplitPoints(keyframes, fromTime, end, segmentCount)
+        if len(points) < 3:
+            return None
+
+        name = Path(inputPath).name
+        output = self.getOutput(inputPath, self.getOutputSuffix())
+        tempDirectory = tempfile.mkdtemp(prefix='segments_', dir=Path(output['path']).parent)
+        filters = self.getFilters()
+        filterOption = ' -vf {}'.format(','.join(filters)) if filters else ''
+        if self.generalParams.get('encoderSettingsTbx'):
+            filterOption += ' ' + self.generalParams['encoderSettingsTbx']
+        jobs = []
+        segmentPaths = []
+        for index, (start, stop) in enumerate(zip(points, points[1:])):
+            segmentPath = Path(tempDirectory).joinpath('{}.mkv'.format(index)).__str__()
+            segmentPaths.append(segmentPath)
+            jobs.append(Job('ffmpeg -ss {:.6f} -i "{}" -t {:.6f} -map 0:v:0 -an{} -y "{}"'.format(
+                start, Path(inputPath).__str__(), stop - start, filterOption, segmentPath),
+                '{} [segment {}/{}]'.format(name, index + 1, len(points) - 1), stop - start))
+
+        audioPath = None
+        if getStream(media, 'audio'):
+            audioPath = Path(tempDirectory).joinpath('audio.mka').__str__()
+            # Matroska would default to Vorbis; the plain mp4 command gets AAC.
+            audioCodec = ' -c:a copy' if self.generalParams.get('copyAudioChk') else ' -c:a aac'
+            jobs.append(Job('ffmpeg -ss {:.6f} -i "{}" -t {:.6f} -map 0:a -vn{} -y "{}"'.format(
+                fromTime, Path(inputPath).__str__(), end - fromTime, audioCodec, audioPath),
+                '{} [audio]'.format(name), end - fromTime))
+
+        listPath = Path(tempDirectory).joinpath('list.txt').__str__()
+        writeConcatList(listPath, segmentPaths)
+        joinChain = ['ffmpeg -f concat -safe 0 -i "{}"'.format(listPath)]
+        if audioPath:
+            joinChain.append('-i "{}" -map 0:v -map 1:a'.format(audioPath))
+        joinChain.append('-c copy')
+        if self.generalParams.get('overwriteChk'):
+            joinChain.append('-y')
+        joinChain.append('"{}"'.format(output['path']))
+        joinJob = Job(command, name, steps=[(' '.join(joinChain), end - fromTime)],
+                      dependencies=list(jobs))
+        joinJob.tempPaths.append(tempDirectory)
+        return jobs + [joinJob]
+
+    def getConcatListPath(self, inputPath) -> str:
+        inputFileName = Path(inputPath).stem
+        directory = Path(inputPath).parent
+        return Path(directory).joinpath('{}_CONCAT.txt'.format(inputFileName)).__str__()
+
+    def getConcatSignature(self, media: dict) -> tuple:
+        # Inputs with the same signature can be joined by stream copy.
+        video = getStream(media, 'video') or {}
+        audio = getStream(media, 'audio') or {}
+        return (
+            video.get('codec_name'), video.get('width'), video.get('height'),
+            video.get('pix_fmt'), video.get('time_base'), video.get('r_frame_rate'),
+            audio.get('codec_name'), audio.get('sample_rate'), audio.get('channels'),
+        )
+
+    def buildNormalizeCommand(self, inputPath, media: dict, reference: dict, outputPath) -> str:
+        video = getStream(reference, 'video')
+        audio = getStream(reference, 'audio')
+        commandChain = ['ffmpeg -i "{}"'.format(Path(inputPath).__str__())]
+        if not video:
+            commandChain.append('-map 0:a:0 -vn')
+        elif audio and not getStream(media, 'audio'):
+            # Silent track so every piece has the same streams.
+            channelLayout = 'mono' if audio.get('channels') == 1 else 'stereo'
+            commandChain.append('-f lavfi -i anullsrc=r={}:cl={}'.format(
+                audio.get('sample_rate'), channelLayout))
+            commandChain.append('-map 0:v:0 -map 1:a:0 -shortest')
+        else:
+            commandChain.append('-map 0:v:0 -map 0:a:0?')
+        if video:
+            commandChain.append(
+                '-vf scale={0}:{1}:force_original_aspect_ratio=decrease,'
+                'pad={0}:{1}:(ow-iw)/2:(oh-ih)/2,setsar=1'.format(video['width'], video['height']))
+            commandChain.append(self.getMatchingEncodeOptions(video))
+            timeBase = (video.get('time_base') or '').partition('/')[2]
+            if timeBase:
+                commandChain.append('-video_track_timescale {}'.format(timeBase))
+        if audio:
+            commandChain.append('-c:a {} -ar {} -ac {}'.format(
+                AUDIO_ENCODERS.get(audio.get('codec_name'), 'aac'),
+                audio.get('sample_rate'), audio.get('channels')))
+        else:
+            commandChain.append('-an')
+        commandChain.append('-y "{}"'.format(outputPath))
+        return ' '.join(commandChain)
+
+    def createConcatJobs(self) -> list:
+        # Inputs that already match the most common codec, resolution and
+        # timebase are joined as they are; only the others are re-encoded
+        # to match, each in its own job so they run in parallel.
+        if not self.paths:
+            return []
+        command = self.buildCommand(self.paths[0])
+        listPath = self.getConcatListPath(self.paths[0])
+        label = '{} (+{})'.format(Path(self.paths[0]).name, len(self.paths) - 1)
+        try:
+            medias = [probeMedia(path) for path in self.paths]
+        except (OSError, ValueError, subprocess.CalledProcessError):
+            medias = None
+
+        piecePaths = list(self.paths)
+        normalizeJobs = []
+        tempDirectory = None
+        if medias:
+            signatures = [self.getConcatSignature(media) for media in medias]
+            commonSignature = max(signatures, key=signatures.count)
+            reference = medias[signatures.index(commonSignature)]
+            referenceVideo = getStream(reference, 'video')
+            if (referenceVideo and referenceVideo.get('codec_name') not in VIDEO_ENCODERS
+                    and len(set(signatures)) > 1):
+                # Nothing to match against: bring every input to H.264.
+                audio = getStream(reference, 'audio')
+                reference = {'streams': [dict(referenceVideo, codec_name='h264', profile=None)]
+                             + ([audio] if audio else [])}
+                commonSignature = None
+            for index, (path, media, signature) in enumerate(zip(self.paths, medias, signatures)):
+                if signature == commonSignature:
+                    continue
+                if tempDirectory is None:
+                    tempDirectory = tempfile.mkdtemp(prefix='concat_', dir=Path(listPath).parent)
+                piecePaths[index] = Path(tempDirectory).joinpath(
+                    '{}.mp4'.format(index)).__str__()
+                normalizeJobs.append(Job(
+                    self.buildNormalizeCommand(path, media, reference, piecePaths[index]),
+                    'normalize {}'.format(Path(path).name), media['duration']))
+
+        writeConcatList(listPath, piecePaths)
+        durations = [media['duration'] for media in medias] if medias else [None]
+        concatJob = Job(command, label, None if None in durations else sum(durations),
+                        dependencies=normalizeJobs)
+        concatJob.tempPaths.append(listPath)
+        if tempDirectory:
+            concatJob.tempPaths.append(tempDirectory)
+        self.setJobOutput(concatJob, self.paths)
+        return normalizeJobs + [concatJob]
+
+    def tuneEncoder(self, inputPath, targetSsim: float = 0.97) -> tuple:
+        fromTime, toTime = self.getCutRange()
+        duration = self.getOutputDuration(inputPath)
+        tuner = EncoderTuner(inputPath, self.getFilters(), fromTime, duration, targetSsim=targetSsim)
+        return tuner.tune()
+
+    def detectBlankRectangle(self, inputPath) -> tuple:
+        try:
+            duration = probeMedia(inputPath)['duration']
+        except (OSError, ValueError, subprocess.CalledProcessError):
+            duration = None
+        return CropDetector(inputPath, duration).detect()
+
+
+def parseTime(value) -> float:
+    # "hh:mm:ss.z", "mm:ss" or plain seconds; None when not a time.
+    try:
+        seconds = 0.0
+        for part in str(value).strip().split(':'):
+            seconds = seconds * 60 + float(part)
+        return seconds
+    except ValueError:
+        return None
+
+
+def formatSeekTime(seconds: float) -> str:
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(int(minutes), 60)
+    return '{:02d}:{:02d}:{:06.3f}'.format(hours, minutes, seconds)
+
+
+def formatTime(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return '{:02d}:{:02d}:{:02d}'.format(hours, minutes, seconds)
+
+
+class LogBuffer():
+    # Keeps only the last lines of a process output. Bytes are decoded
+    # incrementally so characters split across reads survive.
+    def __init__(self, maxLines: int = 500) -> None:
+        self.decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        self.pending = ''
+        self.lines = collections.deque(maxlen=maxLines)
+
+    def feed(self, data: bytes) -> list:
+        text = self.pending + self.decoder.decode(data, final=not data)
+        lines = text.replace('\r', '\n').split('\n')
+        self.pending = lines.pop() if data else ''
+        lines = [line for line in lines if line]
+        self.lines.extend(lines)
+        return lines
+
+    def __str__(self) -> str:
+        return '\n'.join(self.lines)
+
+
+class ProgressParser():
+    # Reads the key=value blocks written by "ffmpeg -progress"; every block
+    # ends with a "progress=" line.
+    def __init__(self) -> None:
+        self.decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        self.pending = ''
+        self.values = {}
+        self.progress = {}
+
+    def feed(self, data: bytes) -> bool:
+        lines = (self.pending + self.decoder.decode(data)).split('\n')
+        self.pending = lines.pop()
+        updated = False
+        for line in lines:
+            key, separator, value = line.strip().partition('=')
+            if not separator:
+                continue
+            if key == 'progress':
+                self.progress = self.parseValues(self.values)
+                self.values = {}
+                updated = True
+            else:
+                self.values[key] = value
+        return updated
+
+    def parseValues(self, values: dict) -> dict:
+        def toNumber(value, cast=float):
+            try:
+                return cast(value)
+            except (TypeError, ValueError):
+                return None
+
+        outTimeUs = toNumber(values.get('out_time_us'), int)
+        return {
+            'frame': toNumber(values.get('frame'), int),
+            'fps': toNumber(values.get('fps')),
+            'out_time': outTimeUs / 1000000 if outTimeUs is not None else None,
+            'speed': toNumber((values.get('speed') or '').rstrip('x')),
+            'bitrate': toNumber((values.get('bitrate') or '').replace('kbits/s', '')),
+            'total_size': toNumber(values.get('total_size'), int),
+        }
+
+
+def waitProcess(process) -> tuple:
+    # wait4 also reports the child's CPU time and peak RSS, where it exists.
+    if not hasattr(os, 'wait4'):
+        return process.wait(), None
+    try:
+        _, status, usage = os.wait4(process.pid, 0)
+    except ChildProcessError:
+        return process.wait(), None
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return process.returncode, usage
+
+
+def splitCommand(command: str):
+    # Windows takes the command line as is; elsewhere split it like a shell.
+    if os.name == 'nt':
+        return command
+    return shlex.split(command)
+
+
+class Job():
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+    ids = itertools.count(1)
+
+    def __init__(self, command: str, label: str = '', duration: float = None,
+                 steps: list = None, dependencies: list = None) -> None:
+        # A job runs its command, or a list of (command, duration) steps one
+        # after another, once all its dependencies are done. tempPaths are
+        # removed once it has finished.
+        self.id = next(self.ids)
+        self.uid = uuid.uuid4().hex
+        self.command = command
+        self.label = label or command
+        self.status = Job.QUEUED
+        self.process = None
+        self.cancelled = False
+        self.returnCode = None
+        self.log = LogBuffer()
+        self.steps = steps or [(command, duration)]
+        stepDurations = [stepDuration for _, stepDuration in self.steps]
+        self.duration = None if None in stepDurations else sum(stepDurations)
+        self.stepOffset = 0.0
+        self.progress = {}
+        self.tempPaths = []
+        self.dependencies = dependencies or []
+        # Set on jobs that write a final output, for the output cache.
+        self.outputPath = None
+        self.inputPaths = []
+        self.variant = ''
+        self.useCache = False
+        self.cached = False
+        self.metrics = {}
+
+    def isFinished(self) -> bool:
+        return self.status in (Job.DONE, Job.FAILED, Job.CANCELLED)
+
+    def getCommandWithProgress(self, command: str) -> str:
+        if command.startswith('ffmpeg '):
+            return 'ffmpeg -progress pipe:1 -nostats' + command[len('ffmpeg'):]
+        return command
+
+    def readLog(self, data: bytes) -> None:
+        for line in self.log.feed(data):
+            if (self.duration is None and len(self.steps) == 1
+                    and line.strip().startswith('Duration:')):
+                self.duration = parseTime(line.split('Duration:')[1].split(',')[0])
+
+    def getOutTime(self) -> float:
+        outTime = self.progress.get('out_time')
+        if outTime is None:
+            return None
+        return self.stepOffset + outTime
+
+    def getPercent(self) -> float:
+        outTime = self.getOutTime()
+        if self.status == Job.DONE:
+            return 100.0
+        if not self.duration or outTime is None:
+            return None
+        return min(100.0, 100 * outTime / self.duration)
+
+    def getEta(self) -> float:
+        outTime = self.getOutTime()
+        speed = self.progress.get('speed')
+        if not self.duration or outTime is None or not speed:
+            return None
+        return max(0.0, (self.duration - outTime) / speed)
+
+    def getInputBytes(self) -> int:
+        inputBytes = 0
+        for command, _ in self.steps:
+            for inputPath in re.findall(r'-i "([^"]+)"', command):
+                if os.path.isfile(inputPath):
+                    inputBytes += os.path.getsize(inputPath)
+        return inputBytes
+
+    def getPartPath(self) -> str:
+        # The output is written under this name and renamed when the job
+        # is done, so an interrupted run never leaves a truncated file.
+        outputPath = Path(self.outputPath)
+        return outputPath.with_name('{}.part{}'.format(outputPath.stem, outputPath.suffix)).__str__()
+
+    def removeTempPaths(self) -> None:
+        for path in self.tempPaths:
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            elif os.path.exists(path):
+                os.remove(path)
+        self.tempPaths = []
+
+
+@functools.lru_cache(maxsize=None)
+def getFfmpegVersion() -> str:
+    try:
+        result = subprocess.run(['ffmpeg', '-version'], stdin=subprocess.DEVNULL, capture_output=True)
+    except OSError:
+        return ''
+    return result.stdout.decode('utf8', 'replace').partition('\n')[0]
+
+
+def getFingerprint(path, sampleSize: int = 1 << 16) -> str:
+    # Size, mtime and three sampled blocks; hashing whole multi-GB inputs
+    # would cost as much as the job itself.
+    stat = os.stat(path)
+    digest = hashlib.sha256('{}:{}'.format(stat.st_size, stat.st_mtime_ns).encode('utf8'))
+    with open(path, 'rb') as inputFile:
+        for offset in (0, stat.st_size // 2, max(stat.st_size - sampleSize, 0)):
+            inputFile.seek(offset)
+            digest.update(inputFile.read(sampleSize))
+    return digest.hexdigest()
+
+
+class OutputCache():
+    # Finished outputs hard-linked into a cache directory under a hash of
+    # what produced them, evicted least recently used first. Copied instead
+    # when the cache is on another filesystem.
+    def __init__(self, directory, maxBytes: int = 20 << 30) -> None:
+        self.directory = Path(directory)
+        self.maxBytes = maxBytes
+        self.lock = threading.Lock()
+        try:
+            with self.connect() as connection:
+                connection.execute('CREATE TABLE IF NOT EXISTS outputs (key TEXT PRIMARY KEY, size INTEGER, '
+                                   'lastUsed REAL)')
+        except (OSError, sqlite3.Error):
+            self.directory = None
+
+    def connect(self):
+        if self.directory is None:
+            raise sqlite3.OperationalError('no output cache directory')
+        self.directory.mkdir(parents=True, exist_ok=True)
+        return sqlite3.connect(str(self.directory.joinpath('outputs.sqlite')), timeout=10)
+
+    def getKey(self, job: Job) -> str:
+        command = ' '.join(token for token in job.command.split() if token != '-y')
+        digest = hashlib.sha256('\n'.join([command, job.variant, getFfmpegVersion()]).encode('utf8'))
+        for inputPath in job.inputPaths:
+            digest.update(getFingerprint(inputPath).encode('utf8'))
+        return digest.hexdigest()
+
+    def restore(self, job: Job) -> bool:
+        if not (job.useCache and job.outputPath):
+            return False
+        try:
+            key = self.getKey(job)
+            storePath = self.directory.joinpath(key)
+            with self.lock, self.connect() as connection:
+                if connection.execute('SELECT key FROM outputs WHERE key = ?', (key,)).fetchone() is None:
+                    return False
+                if not storePath.exists():
+                    connection.execute('DELETE FROM outputs WHERE key = ?', (key,))
+                    return False
+                connection.execute('UPDATE outputs SET lastUsed = ? WHERE key = ?', (time.time(), key))
+            if os.path.exists(job.outputPath):
+                if os.path.samefile(job.outputPath, storePath):
+                    return True
+                if '-y' not in job.command.split():
+                    return False
+            linkPath = job.outputPath + '.cache'
+            if os.path.exists(linkPath):
+                os.remove(linkPath)
+            try:
+                os.link(storePath, linkPath)
+            except OSError:
+                shutil.copy2(storePath, linkPath)
+            os.replace(linkPath, job.outputPath)
+        except (OSError, sqlite3.Error):
+            return False
+        return True
+
+    def store(self, job: Job) -> None:
+        if not (job.useCache and job.outputPath) or not os.path.exists(job.outputPath):
+            return
+        try:
+            key = self.getKey(job)
+            storePath = self.directory.joinpath(key)
+            if storePath.exists():
+                storePath.unlink()
+            try:
+                os.link(job.outputPath, storePath)
+            except OSError:
+                shutil.copy2(job.outputPath, storePath)
+            with self.lock, self.connect() as connection:
+                connection.execute('INSERT OR REPLACE INTO outputs VALUES (?, ?, ?)',
+                                   (key, storePath.stat().st_size, time.time()))
+                self.evict(connection, key)
+        except (OSError, sqlite3.Error):
+            pass
+
+    def evict(self, connection, keepKey: str) -> None:
+        rows = connection.execute('SELECT key, size FROM outputs ORDER BY lastUsed DESC').fetchall()
+        keptSize = 0
+        for key, size in rows:
+            if keptSize + size <= self.maxBytes or key == keepKey:
+                keptSize += size
+                continue
+            connection.execute('DELETE FROM outputs WHERE key = ?', (key,))
+            storePath = self.directory.joinpath(key)
+            if storePath.exists():
+                storePath.unlink()
+
+
+def isProcessAlive(pid: int) -> bool:
+    if sys.platform == 'win32':
+        # os.kill would terminate the process on Windows.
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            return kernel32.GetLastError() == 5
+        exitCode = ctypes.c_ulong()
+        kernel32.GetExitCodeProcess(handle, ctypes.byref(exitCode))
+        kernel32.CloseHandle(handle)
+        return exitCode.value == 259
+    try:
+        os.kill(pid, 0)
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+class JobJournal():
+    # Every job and each status it reaches, so the jobs that were queued or
+    # running when the process died can be submitted again. Each row names
+    # the process that owns it, and only rows whose owner is gone are taken.
+    FIELDS = ('command', 'label', 'steps', 'tempPaths', 'outputPath', 'inputPaths', 'variant', 'useCache')
+
+    def __init__(self, databasePath, keepDays: float = 7) -> None:
+        self.databasePath = databasePath
+        self.owner = '{}:{}'.format(socket.gethostname(), os.getpid())
+        self.statuses = {}
+        self.lock = threading.Lock()
+        try:
+            with self.connect() as connection:
+                connection.execute('CREATE TABLE IF NOT EXISTS jobs (uid TEXT PRIMARY KEY, status TEXT, '
+                                   'dependencies TEXT, data TEXT, updated REAL, owner TEXT)')
+                columns = [column[1] for column in connection.execute('PRAGMA table_info(jobs)')]
+                if 'owner' not in columns:
+                    connection.execute('ALTER TABLE jobs ADD COLUMN owner TEXT')
+                connection.execute('DELETE FROM jobs WHERE status IN (?, ?, ?) AND updated < ?',
+                                   (Job.DONE, Job.FAILED, Job.CANCELLED, time.time() - keepDays * 86400))
+        except (OSError, sqlite3.Error):
+            self.databasePath = None
+
+    def connect(self):
+        if not self.databasePath:
+            raise sqlite3.OperationalError('no job journal')
+        Path(self.databasePath).parent.mkdir(parents=True, exist_ok=True)
+        return sqlite3.connect(str(self.databasePath), timeout=10)
+
+    def record(self, job: Job) -> None:
+        with self.lock:
+            if self.statuses.get(job.uid) == job.status:
+                return
+            self.statuses[job.uid] = job.status
+            data = json.dumps({field: getattr(job, field) for field in self.FIELDS})
+            dependencies = json.dumps([dependency.uid for dependency in job.dependencies])
+            try:
+                with self.connect() as connection:
+                    # An upsert keeps the rowid, so rows stay in the order the
+                    # jobs were created.
+                    connection.execute('INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(uid) DO UPDATE SET '
+                                       'status = excluded.status, dependencies = excluded.dependencies, '
+                                       'data = excluded.data, updated = excluded.updated, owner = excluded.owner',
+                                       (job.uid, job.status, dependencies, data, time.time(), self.owner))
+            except sqlite3.Error:
+                pass
+
+    def isOwnerAlive(self, owner) -> bool:
+        # Rows from before owners were recorded have none. A process on
+        # another host cannot be checked, so it counts as alive.
+        if not owner:
+            return False
+        host, _, pid = owner.rpartition(':')
+        if host != socket.gethostname():
+            return True
+        return int(pid) == os.getpid() or isProcessAlive(int(pid))
+
+    def claim(self, uid, owner) -> bool:
+        try:
+            with self.connect() as connection:
+                return connection.execute('UPDATE jobs SET owner = ? WHERE uid = ? AND owner IS ?',
+                                          (self.owner, uid, owner)).rowcount == 1
+        except sqlite3.Error:
+            return False
+
+    def loadUnfinished(self) -> list:
+        # Running jobs start over; their dependencies that are done are not
+        # run again, since their pieces are still in the temp directories.
+        # Jobs of a process that is still running are left to it.
+        try:
+            with self.connect() as connection:
+                rows = connection.execute('SELECT uid, status, dependencies, data, owner FROM jobs '
+                                          'ORDER BY rowid').fetchall()
+        except sqlite3.Error:
+            return []
+        statuses = {uid: status for uid, status, _, _, _ in rows}
+        pending = {uid: (json.loads(dependencies), data) for uid, status, dependencies, data, owner in rows
+                   if status in (Job.QUEUED, Job.RUNNING)
+                   and not self.isOwnerAlive(owner) and self.claim(uid, owner)}
+        jobs = {}
+        # A job is loaded once all its dependencies are done or loaded, and
+        # fails when one of them failed, was cancelled or is gone. Passes are
+        # repeated until nothing changes, whatever order the rows are in.
+        progress = True
+        while pending and progress:
+            progress = False
+            for uid, (dependencies, data) in list(pending.items()):
+                if any(statuses.get(dependency) not in (Job.DONE, Job.QUEUED, Job.RUNNING)
+                       for dependency in dependencies):
+                    statuses[uid] = Job.FAILED
+                    del pending[uid]
+                    progress = True
+                    try:
+                        with self.connect() as connection:
+                            connection.execute('UPDATE jobs SET status = ?, updated = ? WHERE uid = ?',
+                                               (Job.FAILED, time.time(), uid))
+                    except sqlite3.Error:
+                        pass
+                    continue
+                if any(statuses.get(dependency) != Job.DONE and dependency not in jobs
+                       for dependency in dependencies):
+                    continue
+                fields = json.loads(data)
+                job = Job(fields['command'], fields['label'], steps=[tuple(step) for step in fields['steps']],
+                          dependencies=[jobs[dependency] for dependency in dependencies if dependency in jobs])
+                job.uid = uid
+                for field in self.FIELDS[3:]:
+                    setattr(job, field, fields[field])
+                jobs[uid] = job
+                del pending[uid]
+                progress = True
+        return list(jobs.values())
+
+    def discard(self, jobs: list) -> None:
+        for job in jobs:
+            job.status = Job.CANCELLED
+            self.record(job)
+            job.removeTempPaths()
+
+
+class JobQueue():
+    def __init__(self, maxWorkers: int = 0, listener=None, outputCache: OutputCache = None,
+                 journal: JobJournal = None, metricsPath=None) -> None:
+        self.maxWorkers = maxWorkers or os.cpu_count() or 1
+        self.listener = listener
+        self.outputCache = outputCache
+        self.journal = journal
+        self.metricsPath = metricsPath
+        self.metricsLock = threading.Lock()
+        self.jobs = []
+        self.pending = collections.deque()
+        self.runningCount = 0
+        self.condition = threading.Condition()
+
+    def notify(self, job: Job) -> None:
+        if self.journal:
+            self.journal.record(job)
+        if self.listener:
+            self.listener(job)
+
+    def setMaxWorkers(self, maxWorkers: int) -> None:
+        self.maxWorkers = max(1, maxWorkers)
+        self.schedule()
+
+    def submit(self, job: Job) -> Job:
+        with self.condition:
+            self.jobs.append(job)
+            self.pending.append(job)
+        self.notify(job)
+        self.schedule()
+        return job
+
+    def submitJobs(self, jobs: list) -> list:
+        # Jobs whose output is in the cache are restored instead of run, and
+        # the jobs only they depended on are left out.
+        skippedJobs = set()
+        for job in reversed(jobs):
+            if job in skippedJobs or not self.outputCache or not self.outputCache.restore(job):
+                continue
+            job.cached = True
+            dependencies = list(job.dependencies)
+            while dependencies:
+                dependency = dependencies.pop()
+                skippedJobs.add(dependency)
+                dependencies.extend(dependency.dependencies)
+        for job in jobs:
+            if job in skippedJobs:
+                continue
+            if job.cached:
+                job.status = Job.DONE
+                job.returnCode = 0
+                job.removeTempPaths()
+                self.jobs.append(job)
+                self.notify(job)
+            else:
+                self.submit(job)
+        return [job for job in jobs if job not in skippedJobs]
+
+    def cancel(self, job: Job) -> None:
+        with self.condition:
+            if job.status == Job.QUEUED:
+                self.pending.remove(job)
+                job.status = Job.CANCELLED
+                job.removeTempPaths()
+                self.condition.notify_all()
+            elif job.status == Job.RUNNING:
+                job.cancelled = True
+                if job.process:
+                    job.process.kill()
+                return
+            else:
+                return
+        self.notify(job)
+
+    def cancelAll(self) -> None:
+        for job in list(self.jobs):
+            self.cancel(job)
+
+    def isFinished(self) -> bool:
+        return all(job.isFinished() for job in self.jobs)
+
+    def waitForRoom(self, limit: int) -> None:
+        # Back-pressure for producers: blocks while limit jobs are queued or
+        # running.
+        with self.condition:
+            self.condition.wait_for(lambda: len(self.pending) + self.runningCount < limit)
+
+    def forgetFinished(self) -> None:
+        with self.condition:
+            self.jobs = [job for job in self.jobs if not job.isFinished()]
+
+    def isIdle(self) -> bool:
+        return not self.pending and self.runningCount == 0
+
+    def wait(self) -> None:
+        with self.condition:
+            self.condition.wait_for(self.isIdle)
+
+    def schedule(self) -> None:
+        failedJobs = []
+        with self.condition:
+            for job in list(self.pending):
+                if self.runningCount >= self.maxWorkers:
+                    break
+                dependencyStatuses = {dependency.status for dependency in job.dependencies}
+                if dependencyStatuses & {Job.FAILED, Job.CANCELLED}:
+                    self.pending.remove(job)
+                    job.status = Job.FAILED
+                    job.removeTempPaths()
+                    failedJobs.append(job)
+                elif dependencyStatuses <= {Job.DONE}:
+                    self.pending.remove(job)
+                    job.status = Job.RUNNING
+                    self.runningCount += 1
+                    threading.Thread(target=self.run, args=(job,), daemon=True).start()
+            if failedJobs:
+                self.condition.notify_all()
+        for job in failedJobs:
+            self.notify(job)
+        if failedJobs:
+            self.schedule()
+
+    def readLog(self, job: Job, stream) -> None:
+        for data in iter(lambda: stream.read1(1 << 16), b''):
+            job.readLog(data)
+        job.readLog(b'')
+
+    def runStep(self, job: Job, command: str) -> int:
+        started = time.perf_counter()
+        job.process = subprocess.Popen(
+            splitCommand(job.getCommandWithProgress(command)), stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if job.cancelled:
+            job.process.kill()
+        logReader = threading.Thread(target=self.readLog, args=(job, job.process.stderr))
+        logReader.start()
+        progressParser = ProgressParser()
+        for data in iter(lambda: job.process.stdout.read1(1 << 16), b''):
+            if progressParser.feed(data):
+                job.progress = progressParser.progress
+                self.notify(job)
+        logReader.join()
+        returnCode, usage = waitProcess(job.process)
+        self.addStepMetrics(job, time.perf_counter() - started, usage)
+        return returnCode
+
+    def addStepMetrics(self, job: Job, wallTime: float, usage) -> None:
+        metrics = job.metrics
+        metrics['wallTime'] = metrics.get('wallTime', 0) + wallTime
+        metrics['speed'] = job.progress.get('speed')
+        metrics['fps'] = job.progress.get('fps')
+        metrics['outputBytes'] = job.progress.get('total_size')
+        if usage is not None:
+            metrics['cpuTime'] = metrics.get('cpuTime', 0) + usage.ru_utime + usage.ru_stime
+            # ru_maxrss is in kilobytes, except on macOS.
+            peakRss = usage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+            metrics['peakRss'] = max(metrics.get('peakRss', 0), peakRss)
+
+    def writeMetrics(self, job: Job) -> None:
+        record = dict({
+            'time': time.time(),
+            'uid': job.uid,
+            'label': job.label,
+            'status': job.status,
+            'command': job.command,
+            'steps': len(job.steps),
+            'duration': job.duration,
+            'inputBytes': job.getInputBytes(),
+        }, **job.metrics)
+        if job.outputPath and job.status == Job.DONE and os.path.exists(job.outputPath):
+            record['outputBytes'] = os.path.getsize(job.outputPath)
+        try:
+            with self.metricsLock, open(self.metricsPath, 'a', encoding='utf8') as metricsFile:
+                metricsFile.write(json.dumps(record, ensure_ascii=False) + '\n')
+        except OSError:
+            pass
+
+    def run(self, job: Job) -> None:
+        self.notify(job)
+        partPath = None
+        try:
+            for index, (command, stepDuration) in enumerate(job.steps):
+                if job.cancelled:
+                    break
+                quotedOutput = '"{}"'.format(job.outputPath)
+                if job.outputPath and index == len(job.steps) - 1 and quotedOutput in command:
+                    if os.path.exists(job.outputPath) and '-y' not in command.split():
+                        raise FileExistsError('Output {} already exists.'.format(job.outputPath))
+                    partPath = job.getPartPath()
+                    if os.path.exists(partPath):
+                        os.remove(partPath)
+                    command = command.replace(quotedOutput, '"{}"'.format(partPath))
+                job.progress = {}
+                job.returnCode = self.runStep(job, command)
+                if job.returnCode != 0:
+                    break
+                job.stepOffset += stepDuration or 0
+            if partPath and job.returnCode == 0 and not job.cancelled:
+                os.replace(partPath, job.outputPath)
+        except (OSError, ValueError) as error:
+            # ValueError comes from splitCommand, e.g. a path with a quote.
+            job.log.feed((str(error) + '\n').encode('utf8'))
+            job.returnCode = None
+        finally:
+            job.removeTempPaths()
+            if partPath and os.path.exists(partPath):
+                os.remove(partPath)
+        if job.returnCode == 0 and not job.cancelled and self.outputCache:
+            self.outputCache.store(job)
+        with self.condition:
+            if job.cancelled:
+                job.status = Job.CANCELLED
+            elif job.returnCode == 0:
+                job.status = Job.DONE
+            else:
+                job.status = Job.FAILED
+            job.process = None
+        if self.metricsPath:
+            self.writeMetrics(job)
+        # Listeners hear about the job before wait() can return.
+        self.notify(job)
+        with self.condition:
+            self.runningCount -= 1
+            self.condition.notify_all()
+        self.schedule()
+
+
+class FolderWatcher():
+    # Yields the files that appear in a folder once they are completely
+    # written: on close-write or move-in with inotify on Linux, otherwise
+    # once their size and mtime have not changed for settle seconds.
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self, directory, settle: float = 2.0, interval: float = 1.0, existing: bool = False) -> None:
+        self.directory = os.path.abspath(directory)
+        self.settle = settle
+        self.interval = interval
+        self.existing = existing
+        self.stopped = False
+
+    def stop(self) -> None:
+        self.stopped = True
+
+    def openInotify(self) -> int:
+        if not sys.platform.startswith('linux'):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            fd = libc.inotify_init1(os.O_CLOEXEC)
+            if fd < 0:
+                return None
+            if libc.inotify_add_watch(fd, os.fsencode(self.directory), self.IN_CLOSE_WRITE | self.IN_MOVED_TO) < 0:
+                os.close(fd)
+                return None
+        except (OSError, AttributeError):
+            return None
+        return fd
+
+    def listFiles(self) -> dict:
+        files = {}
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.is_file():
+                    stat = entry.stat()
+                    files[entry.path] = (stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                pass
+        return files
+
+    def __iter__(self):
+        fd = self.openInotify()
+        seen = self.listFiles()
+        if self.existing:
+            yield from sorted(seen)
+        if fd is None:
+            yield from self.poll(seen)
+            return
+        try:
+            while not self.stopped:
+                if not select.select([fd], [], [], self.interval)[0]:
+                    continue
+                data = os.read(fd, 1 << 16)
+                offset = 0
+                while offset < len(data):
+                    _, mask, _, nameLength = self.EVENT_HEADER.unpack_from(data, offset)
+                    offset += self.EVENT_HEADER.size
+                    name = data[offset:offset + nameLength].rstrip(b'\0')
+                    offset += nameLength
+                    path = os.path.join(self.directory, os.fsdecode(name))
+                    if name and os.path.isfile(path):
+                        yield path
+        finally:
+            os.close(fd)
+
+    def poll(self, seen: dict):
+        changed = {}
+        while not self.stopped:
+            now = time.monotonic()
+            for path, signature in self.listFiles().items():
+                if seen.get(path) == signature:
+                    continue
+                if path not in changed or changed[path][0] != signature:
+                    changed[path] = (signature, now)
+                elif now - changed[path][1] >= self.settle:
+                    del changed[path]
+                    seen[path] = signature
+                    yield path
+            time.sleep(self.interval)
+
+
+class EncoderTuner():
+    # Encodes a short sample from the middle of the output with a grid of
+    # x264 presets and CRFs in parallel, and picks the cheapest setting whose
+    # SSIM against a lossless cut of the same sample meets the target. Cost
+    # is CPU time where it can be measured, since the parallel runs share
+    # the cores and skew each other's wall time.
+    PRESETS = ('ultrafast', 'veryfast', 'fast', 'medium')
+    CRFS = (18, 23, 28)
+
+    def __init__(self, inputPath, filters: list, start: float = 0, duration: float = None,
+                 sampleLength: float = 10, targetSsim: float = 0.97, maxWorkers: int = 0) -> None:
+        self.inputPath = inputPath
+        self.filters = filters
+        self.sampleStart = start + max((duration or 0) - sampleLength, 0) / 2
+        self.sampleLength = min(sampleLength, duration) if duration else sampleLength
+        self.targetSsim = targetSsim
+        self.maxWorkers = maxWorkers or os.cpu_count() or 1
+
+    def getSettings(self, preset: str, crf: int) -> str:
+        return '-c:v libx264 -preset {} -crf {}'.format(preset, crf)
+
+    def runCommand(self, command: str) -> tuple:
+        started = time.perf_counter()
+        process = subprocess.Popen(splitCommand(command), stdin=subprocess.DEVNULL,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        log = process.stderr.read().decode('utf8', 'replace')
+        returnCode, usage = waitProcess(process)
+        if returnCode != 0:
+            raise subprocess.CalledProcessError(returnCode, command, stderr=log)
+        cpuTime = usage.ru_utime + usage.ru_stime if usage is not None else None
+        return log, time.perf_counter() - started, cpuTime
+
+    def cutReference(self, referencePath) -> None:
+        filterOption = ' -vf {}'.format(','.join(self.filters)) if self.filters else ''
+        self.runCommand('ffmpeg -v error -ss {:.3f} -i "{}" -t {:.3f} -map 0:v:0 -an{} '
+                        '-c:v libx264 -preset ultrafast -qp 0 -y "{}"'.format(
+                            self.sampleStart, Path(self.inputPath).__str__(), self.sampleLength,
+                            filterOption, referencePath))
+
+    def measure(self, referencePath, directory, preset: str, crf: int) -> dict:
+        samplePath = Path(directory).joinpath('{}_{}.mkv'.format(preset, crf)).__str__()
+        _, wallTime, cpuTime = self.runCommand('ffmpeg -v error -i "{}" {} -y "{}"'.format(
+            referencePath, self.getSettings(preset, crf), samplePath))
+        log, _, _ = self.runCommand(
+            'ffmpeg -nostats -i "{}" -i "{}" -lavfi "[0:v]split[a][b];[1:v]split[c][d];[a][c]ssim;[b][d]psnr" '
+            '-f null -'.format(samplePath, referencePath))
+        ssim = re.search(r'SSIM .*All:([\d.]+)', log)
+        psnr = re.search(r'PSNR .*average:([\d.]+|inf)', log)
+        return {
+            'preset': preset,
+            'crf': crf,
+            'settings': self.getSettings(preset, crf),
+            'wallTime': wallTime,
+            'cpuTime': cpuTime,
+            'speed': self.sampleLength / wallTime if wallTime else None,
+            'bytes': os.path.getsize(samplePath),
+            'ssim': float(ssim.group(1)) if ssim else None,
+            'psnr': float(psnr.group(1)) if psnr else None,
+        }
+
+    def tune(self) -> tuple:
+        # Returns the chosen settings and every measured result. Without a
+        # result that meets the target, the one with the best SSIM wins.
+        directory = tempfile.mkdtemp(prefix='tune_')
+        try:
+            referencePath = Path(directory).joinpath('reference.mkv').__str__()
+            self.cutReference(referencePath)
+            grid = list(itertools.product(self.PRESETS, self.CRFS))
+            with ThreadPoolExecutor(max_workers=min(self.maxWorkers, len(grid))) as executor:
+                results = list(executor.map(lambda setting: self.measure(referencePath, directory, *setting), grid))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        passing = [result for result in results if (result['ssim'] or 0) >= self.targetSsim]
+        if passing:
+            chosen = min(passing, key=lambda result: (result['cpuTime'] if result['cpuTime'] is not None
+                                                      else result['wallTime'], result['bytes']))
+        else:
+            chosen = max(results, key=lambda result: result['ssim'] or 0)
+        return chosen['settings'], results
+
+
+class CropDetector():
+    # Runs cropdetect at evenly spaced points with input seeking, all in
+    # parallel, and stops the rest once enough samples agree. A dark intro
+    # only spoils the samples taken inside it.
+    def __init__(self, inputPath, duration: float = None, samples: int = 8, frames: int = 10,
+                 agreement: float = 0.75) -> None:
+        self.inputPath = inputPath
+        self.duration = duration
+        self.samples = samples
+        self.frames = frames
+        self.agreement = agreement
+        self.rectangles = []
+        self.processes = []
+        self.stopped = False
+        self.lock = threading.Lock()
+
+    def getSampleTimes(self) -> list:
+        if not self.duration:
+            return [60]
+        return [self.duration * (index + 1) / (self.samples + 1) for index in range(self.samples)]
+
+    def buildCommand(self, seekTime: float) -> str:
+        return 'ffmpeg -nostats -ss {:.3f} -i "{}" -map 0:v:0 -vframes {} -vf cropdetect -f null -'.format(
+            seekTime, Path(self.inputPath).__str__(), self.frames)
+
+    def parseRectangle(self, line: str) -> tuple:
+        position = line.rfind('crop=')
+        if position < 0:
+            return None
+        try:
+            width, height, x, y = (int(value) for value in line[position + 5:].split()[0].split(':'))
+        except ValueError:
+            return None
+        if width <= 0 or height <= 0:
+            return None
+        return width, height, x, y
+
+    def runSample(self, seekTime: float) -> None:
+        with self.lock:
+            if self.stopped:
+                return
+            process = subprocess.Popen(splitCommand(self.buildCommand(seekTime)), stdin=subprocess.DEVNULL,
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            self.processes.append(process)
+        rectangle = None
+        for line in codecs.getreader('utf8')(process.stderr, 'replace'):
+            rectangle = self.parseRectangle(line) or rectangle
+        process.wait()
+        if rectangle is None:
+            return
+        with self.lock:
+            self.rectangles.append(rectangle)
+            if self.stopped or len(self.rectangles) * 2 < self.samples:
+                return
+            _, confidence = self.getConsensus()
+            if confidence >= self.agreement:
+                self.stopped = True
+                for other in self.processes:
+                    if other.poll() is None:
+                        other.kill()
+
+    def getConsensus(self) -> tuple:
+        # The most common rectangle when it has a majority, otherwise the
+        # box that covers every sample.
+        if not self.rectangles:
+            return None, 0
+        rectangle, count = collections.Counter(self.rectangles).most_common(1)[0]
+        confidence = count / len(self.rectangles)
+        if confidence <= 0.5:
+            left = min(x for _, _, x, _ in self.rectangles)
+            top = min(y for _, _, _, y in self.rectangles)
+            right = max(x + width for width, _, x, _ in self.rectangles)
+            bottom = max(y + height for _, height, _, y in self.rectangles)
+            rectangle = (right - left, bottom - top, left, top)
+        return rectangle, confidence
+
+    def detect(self) -> tuple:
+        sampleTimes = self.getSampleTimes()
+        with ThreadPoolExecutor(max_workers=len(sampleTimes)) as executor:
+            list(executor.map(self.runSample, sampleTimes))
+        rectangle, confidence = self.getConsensus()
+        if rectangle is None:
+            return '', 0
+        return ':'.join(str(value) for value in rectangle), confidence
+
+
+def loadPreset(presetPath) -> list:
+    # A preset is the list of Model events the GUI would send, in order.
+    with open(presetPath, encoding='utf8') as presetFile:
+        preset = json.load(presetFile)
+    return preset if isinstance(preset, list) else [preset]
+
+
+def savePreset(presetPath, preset: list) -> None:
+    with open(presetPath, 'w', encoding='utf8') as presetFile:
+        json.dump(preset, presetFile, ensure_ascii=False, indent=2)
+
+
+def watchFolder(args, model: Model, jobQueue: JobQueue) -> int:
+    # Each finished file runs through the preset; the watcher is only read
+    # again once the queue has room, so a burst of files waits on disk.
+    if model.feature == 'CONCAT':
+        print('CONCAT cannot run on a watched folder.', file=sys.stderr)
+        return 2
+    outputEnding = '_{}.mp4'.format(model.getOutputSuffix())
+    watcher = FolderWatcher(args.watch, settle=args.settle, existing=args.existing)
+    print('Watching {}'.format(watcher.directory), file=sys.stderr, flush=True)
+    try:
+        for path in watcher:
+            name = Path(path).name
+            if (name.endswith(outputEnding) or '.part.' in name or name.endswith('.cache')
+                    or name.startswith('.')):
+                continue
+            jobQueue.waitForRoom(args.backlog or 2 * jobQueue.maxWorkers)
+            jobQueue.forgetFinished()
+            model.setValueToState({'dragDropFile': [path]})
+            jobQueue.submitJobs(model.createJobs())
+    except KeyboardInterrupt:
+        watcher.stop()
+        jobQueue.cancelAll()
+        jobQueue.wait()
+        return 130
+    return 0
+
+
+def getEvents(args) -> list:
+    # Defaults first, then the preset, then only the flags that were passed,
+    # so a preset saved from the GUI does not override -y or --no-cache.
+    events = [{'copyAudioChk': True, 'maxJobsSpb': args.jobs, 'useCacheChk': True}]
+    events.extend(loadPreset(args.preset) if args.preset else [])
+    general = {}
+    if args.no_copy_audio:
+        general['copyAudioChk'] = False
+    if args.no_cache:
+        general['useCacheChk'] = False
+    if args.overwrite:
+        general['overwriteChk'] = True
+    if args.segments:
+        general['segmentsSpb'] = args.segments
+    if args.encoder_settings:
+        general['encoderSettingsTbx'] = args.encoder_settings
+    if general:
+        events.append(general)
+    if args.feature:
+        events.append({'featureSelectorCbb': list(META.keys()).index(args.feature)})
+        featureParams = {
+            'fromTimeTbx': args.fromTime,
+            'toTimeTbx': args.toTime,
+            'accurateSeekChk': args.accurate_seek or None,
+            'smartCutChk': args.smart_cut or None,
+            'rotateModeGroup': args.rotate,
+            'cropTbx': args.crop,
+            'blankRectangle': args.blank_rectangle,
+            'remuxChk': args.remux or None,
+        }
+        events.append({key: value for key, value in featureParams.items() if value is not None})
+    return events
+
+
+def printJob(job: Job) -> None:
+    if not job.isFinished():
+        return
+    print('[{}] {}'.format('cached' if job.cached else job.status, job.label), file=sys.stderr, flush=True)
+    if job.status == Job.FAILED:
+        print(str(job.log)[-2000:], file=sys.stderr, flush=True)
+
+
+def parseArgs(argv=None):
+    parser = argparse.ArgumentParser(description='Run video_editor features without the GUI.')
+    parser.add_argument('inputs', nargs='*', help='input files, joined in this order for CONCAT')
+    parser.add_argument('--watch', help='process every file written into this folder, until interrupted')
+    parser.add_argument('--existing', action='store_true', help='with --watch, also process the files already there')
+    parser.add_argument('--settle', type=float, default=2.0,
+                        help='with --watch and no inotify, seconds a file must stay unchanged')
+    parser.add_argument('--backlog', type=int, help='with --watch, jobs queued or running before it stops reading')
+    parser.add_argument('--save-preset', help='write the resulting Model state to this preset file')
+    parser.add_argument('--resume', action='store_true', help='run the jobs left unfinished by an earlier run')
+    parser.add_argument('--preset', help='JSON file with the Model events to apply')
+    parser.add_argument('--feature', choices=list(META.keys()), help='feature to apply after the preset')
+    parser.add_argument('--from', dest='fromTime', help='CUT start, hh:mm:ss.mmm or seconds')
+    parser.add_argument('--to', dest='toTime', help='CUT end, hh:mm:ss.mmm or seconds')
+    parser.add_argument('--accurate-seek', action='store_true', help='CUT with output seeking')
+    parser.add_argument('--smart-cut', action='store_true', help='CUT at any frame, re-encoding only the edges')
+    parser.add_argument('--rotate', type=int, choices=[mode['value'] for mode in ROTATE_MODE],
+                        help='ROTATE mode (transpose value)')
+    parser.add_argument('--crop', help='CROP rectangle, w:h:x:y')
+    parser.add_argument('--blank-rectangle', help='RMBLBAR rectangle, w:h:x:y, or "auto" to detect it')
+    parser.add_argument('--remux', action='store_true', help='FORMAT by copying every stream the output supports')
+    parser.add_argument('--encoder-settings', help='video encoder options added to each command, e.g. "-crf 23"')
+    parser.add_argument('--tune', action='store_true',
+                        help='pick the encoder settings on a sample of the first input first')
+    parser.add_argument('--target-ssim', type=float, default=0.97, help='quality target for --tune')
+    parser.add_argument('--no-copy-audio', action='store_true', help='re-encode the audio')
+    parser.add_argument('-y', '--overwrite', action='store_true', help='overwrite existing outputs')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help='parallel ffmpeg jobs')
+    parser.add_argument('--segments', type=int, help='split each input and encode the parts in parallel')
+    parser.add_argument('--no-cache', action='store_true', help='always run, ignoring and not filling the output cache')
+    parser.add_argument('--cache-size', type=int, default=20, help='output cache limit in GiB')
+    parser.add_argument('--metrics', default=str(getCachePath('metrics.jsonl')),
+                        help='append per-job metrics to this JSONL file')
+    parser.add_argument('--dry-run', action='store_true', help='print the ffmpeg commands only')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parseArgs(argv)
+    if not args.inputs and not args.resume and not args.watch and not args.save_preset:
+        print('Nothing to do: give input files, --watch or --resume.', file=sys.stderr)
+        return 2
+    args.inputs = [os.path.abspath(inputPath) for inputPath in args.inputs]
+    model = Model()
+    model.setValueToState({'dragDropFile': args.inputs})
+    for events in getEvents(args):
+        model.setValueToState(events)
+    if model.featureParams.get('blankRectangle') == 'auto' and args.inputs:
+        blankRectangle, confidence = model.detectBlankRectangle(args.inputs[0])
+        if not blankRectangle:
+            print('No blank bars found in {}.'.format(args.inputs[0]), file=sys.stderr)
+            return 1
+        print('crop={} (confidence {:.0%})'.format(blankRectangle, confidence), file=sys.stderr)
+        model.setValueToState({'blankRectangle': blankRectangle})
+    if args.tune and args.inputs:
+        encoderSettings, tuneResults = model.tuneEncoder(args.inputs[0], args.target_ssim)
+        for result in tuneResults:
+            print('{settings:<40} {speed:>7.2f}x {bytes:>10} SSIM {ssim}'.format(**result), file=sys.stderr)
+        print('chosen: {}'.format(encoderSettings), file=sys.stderr)
+        model.setValueToState({'encoderSettingsTbx': encoderSettings})
+    if args.save_preset:
+        savePreset(args.save_preset, model.getPreset())
+
+    newJobs = model.createJobs() if args.inputs else []
+    journal = JobJournal(getCachePath('jobs.sqlite'))
+    jobs = journal.loadUnfinished() + newJobs if args.resume else newJobs
+    for inputPath in args.inputs:
+        remuxReport = model.getRemuxReport(inputPath)
+        if remuxReport:
+            print('{}:\n{}'.format(inputPath, remuxReport), file=sys.stderr)
+    if args.dry_run:
+        for job in jobs:
+            for command, _ in job.steps:
+                print(command)
+        # Nothing runs, so the lists and directories createJobs made are
+        # removed here. Resumed jobs keep theirs for a real run.
+        for job in newJobs:
+            job.removeTempPaths()
+        return 0
+
+    outputCache = OutputCache(getCachePath('outputs'), args.cache_size << 30)
+    jobQueue = JobQueue(args.jobs, listener=printJob, outputCache=outputCache, journal=journal,
+                        metricsPath=args.metrics)
+    if args.watch:
+        jobQueue.submitJobs(jobs)
+        return watchFolder(args, model, jobQueue)
+    jobs = jobQueue.submitJobs(jobs)
+    try:
+        jobQueue.wait()
+    except KeyboardInterrupt:
+        jobQueue.cancelAll()
+        jobQueue.wait()
+        return 130
+    return 0 if all(job.status == Job.DONE for job in jobs) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())